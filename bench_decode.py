@@ -0,0 +1,145 @@
+import argparse
+import json
+import random
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import decode
+from model import INTERACTION_FIELDS
+
+# Benchmark de decodificación: tiempo y pico de RSS antes (json.loads + dicts anidados,
+# aplanados a las mismas filas) y después: decodificador rápido + proyección (lo que usa
+# decode_records por defecto) y modo incremental (streaming=True, o respuestas por
+# encima de STREAMING_THRESHOLD), más lento pero sin árbol completo en memoria.
+# Cada variante corre en su propio proceso para que el pico de RSS sea independiente.
+
+VARIANTS = ["baseline", "projection", "streaming"]
+
+
+def fake_response(n_interactions, seed=42):
+    """Respuesta con la misma forma que get_user_interactions para un usuario muy activo."""
+    rng = random.Random(seed)
+    types = ["view", "click", "purchase"]
+    interactions = []
+    for i in range(n_interactions):
+        interactions.append({
+            "uid": hex(0x10000 + i),
+            "interaction_type": rng.choice(types),
+            "timestamp": f"2024-11-{rng.randint(1, 28):02d}T12:{rng.randint(0, 59):02d}:00Z",
+            "duration": round(rng.uniform(0.5, 60), 1),
+            "with_product": [{
+                "uid": hex(0x100 + rng.randint(0, 500)),
+                "name": f"Product {rng.randint(0, 500)}",
+                "category": rng.choice(["Posters", "Canvas", "Stickers", "Decor"]),
+                "price": round(rng.uniform(5, 300), 2),
+            }],
+        })
+    data = {"user": [{"uid": "0x1", "name": "Power User", "email": "power@user.com",
+                      "~by_user": interactions}]}
+    return json.dumps(data).encode("utf-8")
+
+
+def run_baseline(raw):
+    # json.loads + recorrido anidado, aplanado a las mismas filas (como dicts) que la proyección
+    data = json.loads(raw)
+    rows = []
+    for u in data.get("user", []):
+        for i in u.get("~by_user", []):
+            product = (i.get("with_product") or [{}])[0]
+            rows.append({
+                "uid": i.get("uid"),
+                "interaction_type": i.get("interaction_type"),
+                "timestamp": i.get("timestamp"),
+                "duration": i.get("duration"),
+                "product_uid": product.get("uid"),
+                "product_name": product.get("name"),
+                "category": product.get("category"),
+                "price": product.get("price"),
+            })
+    return rows
+
+
+def run_projection(raw):
+    return decode.decode_records(raw, INTERACTION_FIELDS, streaming=False)
+
+
+def run_streaming(raw):
+    return decode.decode_records(raw, INTERACTION_FIELDS, streaming=True)
+
+
+def peak_rss_mb():
+    # ru_maxrss se hereda del proceso padre; en Linux VmHWM es propio del proceso
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB, macOS bytes
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_variant(variant, payload_path, repeat):
+    with open(payload_path, "rb") as f:
+        raw = f.read()
+    base_rss = peak_rss_mb()
+    func = {"baseline": run_baseline, "projection": run_projection, "streaming": run_streaming}[variant]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func(raw)
+        timings.append(time.perf_counter() - start)
+        del rows
+    return {
+        "variant": variant,
+        "decoder": {"baseline": "json", "streaming": "ijson"}.get(variant, decode.decoder_name()),
+        "payload_mb": round(len(raw) / 1024 / 1024, 2),
+        "best_s": round(min(timings), 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "decode_rss_mb": round(peak_rss_mb() - base_rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificación de respuestas")
+    parser.add_argument("--interactions", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--payload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.payload, args.repeat)))
+        return
+
+    # La respuesta se genera una sola vez y cada variante la lee de disco
+    fd, payload_path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "wb") as f:
+        f.write(fake_response(args.interactions))
+
+    print(f"{'variante':<12}{'decoder':<10}{'payload MB':>12}{'tiempo s':>10}{'pico RSS MB':>14}{'RSS decode MB':>15}")
+    try:
+        for variant in VARIANTS:
+            if variant == "streaming" and decode.ijson is None:
+                print(f"{variant:<12}(ijson no instalado, se omite)")
+                continue
+            out = subprocess.run(
+                [sys.executable, __file__, "--variant", variant,
+                 "--payload", payload_path, "--repeat", str(args.repeat)],
+                check=True, capture_output=True, text=True,
+            )
+            r = json.loads(out.stdout)
+            print(f"{r['variant']:<12}{r['decoder']:<10}{r['payload_mb']:>12}{r['best_s']:>10}"
+                  f"{r['peak_rss_mb']:>14}{r['decode_rss_mb']:>15}")
+    finally:
+        os.remove(payload_path)
+
+
+if __name__ == "__main__":
+    main()
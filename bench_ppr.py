@@ -0,0 +1,85 @@
+import argparse
+import time
+
+import numpy as np
+
+from ppr import BipartiteGraph, affected_users, graph_edges, personalized_pagerank, recommend, top_k
+
+# Benchmark del motor PPR sobre un grafo bipartito sintético (sin Dgraph):
+# throughput en usuarios/s para distintos tamaños de lote y coincidencia del top-k
+# con la solución convergida según el número de iteraciones.
+
+
+def synthetic_edges(n_users, n_products, avg_degree, seed=42):
+    """Aristas con popularidad de producto tipo Zipf, como en un catálogo real."""
+    rng = np.random.default_rng(seed)
+    n_edges = n_users * avg_degree
+    users = rng.integers(0, n_users, n_edges).astype(np.uint64) + 0x1000
+    popularity = 1.0 / np.arange(1, n_products + 1)
+    products = rng.choice(n_products, n_edges, p=popularity / popularity.sum()).astype(np.uint64)
+    products += 0x1000 + n_users
+    weights = rng.choice([1.0, 2.0, 4.0, 5.0], n_edges)
+    return users, products, weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de Personalized PageRank")
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--degree", type=int, default=20)
+    parser.add_argument("--sample", type=int, default=2_048, help="usuarios a recomendar por medición")
+    parser.add_argument("--batch-sizes", default="32,128,512")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--new-edges", type=int, default=200, help="aristas nuevas para medir el modo incremental")
+    parser.add_argument("--tols", default="0.01,0.05,0.1", help="tolerancias de affected_users a medir")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = BipartiteGraph(*synthetic_edges(args.users, args.products, args.degree))
+    print(f"Grafo: {graph.W.shape[0]} usuarios × {graph.W.shape[1]} productos, "
+          f"{graph.W.nnz} aristas (construido en {time.perf_counter() - start:.2f}s)")
+
+    # Modo incremental: usuarios a recalcular tras un lote de aristas nuevas, y error
+    # observado (L1 frente al PPR convergido) en una muestra de los que no se recalculan
+    users, products, weights = graph_edges(graph)
+    rng = np.random.default_rng(7)
+    picks = rng.integers(0, len(users), args.new_edges)
+    changed = BipartiteGraph(np.append(users, users[picks]), np.append(products, rng.permutation(products[picks])),
+                             np.append(weights, weights[picks]))
+    print(f"\nIncremental: {args.new_edges} aristas nuevas")
+    print(f"{'tol':>8}{'usuarios':>12}{'fracción':>10}{'tiempo s':>10}{'error máx':>11}")
+    for tol in (float(t) for t in args.tols.split(",")):
+        start = time.perf_counter()
+        affected = affected_users((users, products, weights), changed, tol=tol)
+        elapsed = time.perf_counter() - start
+        skipped = np.setdiff1d(changed.user_ids, [int(u, 16) for u in affected])
+        sample = rng.choice(skipped, min(256, len(skipped)), replace=False)
+        error = 0.0
+        if len(sample):
+            before = personalized_pagerank(graph, graph.user_index([hex(int(u)) for u in sample]), iterations=60, tol=0)
+            after = personalized_pagerank(changed, changed.user_index([hex(int(u)) for u in sample]),
+                                          iterations=60, tol=0)
+            error = np.abs(after - before).sum(axis=1).max()
+        print(f"{tol:>8}{len(affected):>12}{len(affected) / changed.n_users:>10.3f}{elapsed:>10.2f}{error:>11.4f}")
+
+    rows = np.arange(min(args.sample, graph.n_users))
+    print(f"\n{'lote':>6}{'usuarios':>10}{'tiempo s':>10}{'usuarios/s':>12}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        start = time.perf_counter()
+        recommend(graph, rows, k=args.top_k, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>6}{len(rows):>10}{elapsed:>10.2f}{len(rows) / elapsed:>12.0f}")
+
+    # Calidad: top-k con pocas iteraciones frente a 60 iteraciones
+    check = rows[:64]
+    reference = top_k(graph, check, personalized_pagerank(graph, check, iterations=60, tol=0), args.top_k)
+    print(f"\n{'iteraciones':>12}{'coincidencia top-k':>20}")
+    for iterations in (5, 10, 20):
+        approx = top_k(graph, check, personalized_pagerank(graph, check, iterations=iterations, tol=0), args.top_k)
+        overlap = np.mean([len({p for p, _ in a} & {p for p, _ in b}) / max(len(a), 1)
+                           for a, b in zip(reference, approx)])
+        print(f"{iterations:>12}{overlap:>20.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import collections
+import json
+import random
+import statistics
+import time
+
+from sketches import InteractionSketches, distinct_users, top_k_trending
+
+# Benchmark de los sketches frente a los conteos exactos sobre un flujo sintético
+# (popularidad Zipf): error del count-min contra su cota ε·N, precisión del top-k,
+# error relativo de HyperLogLog y fusión de varios workers en paralelo.
+
+TYPES = ["view", "view", "view", "click", "purchase"]
+
+
+def synthetic_stream(n_events, n_users, n_products, seed=42):
+    rng = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(n_products)]
+    products = rng.choices(range(n_products), weights=weights, k=n_events)
+    for product in products:
+        yield f"0x{product + 0x1000:x}", f"0x{rng.randrange(n_users) + 0x100000:x}", rng.choice(TYPES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de sketches de interacciones")
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    events = list(synthetic_stream(args.events, args.users, args.products))
+
+    # Exacto
+    exact_counts = collections.defaultdict(collections.Counter)
+    exact_users = collections.defaultdict(set)
+    for product, user, itype in events:
+        exact_counts[itype][product] += 1
+        exact_users[(itype, product)].add(user)
+
+    # Aproximado: un worker por porción del flujo y fusión al final
+    start = time.perf_counter()
+    chunk = (len(events) + args.workers - 1) // args.workers
+    workers = []
+    for w in range(args.workers):
+        sketches = InteractionSketches(k=args.k)
+        for product, user, itype in events[w * chunk:(w + 1) * chunk]:
+            sketches.add(product, user, itype)
+        workers.append(sketches)
+    merged = workers[0]
+    for other in workers[1:]:
+        merged.merge(other)
+    elapsed = time.perf_counter() - start
+    size_kb = len(json.dumps(merged.to_dict())) / 1024
+    print(f"{len(events)} eventos en {elapsed:.2f}s ({len(events) / elapsed:.0f} eventos/s), "
+          f"{args.workers} workers fusionados, serializado {size_kb:.0f} KiB")
+
+    # Count-min y top-k por tipo
+    print(f"\n{'tipo':<10}{'N':>9}{'cota εN':>10}{'err medio':>11}{'err máx':>9}{'>cota':>7}{'recall top-k':>14}")
+    for itype, counts in sorted(exact_counts.items()):
+        top = merged.popularity[itype]
+        errors = [top.cms.estimate(p) - c for p, c in counts.items()]
+        bound = top.cms.error_bound()
+        exact_top = {p for p, _ in counts.most_common(args.k)}
+        approx_top = {p for p, _ in top_k_trending(merged, itype, args.k)}
+        print(f"{itype:<10}{sum(counts.values()):>9}{bound:>10.1f}{statistics.mean(errors):>11.2f}"
+              f"{max(errors):>9}{sum(e > bound for e in errors):>7}{len(exact_top & approx_top) / args.k:>14.2f}")
+
+    # HyperLogLog
+    print(f"\n{'tipo':<10}{'productos':>10}{'err rel medio':>15}{'err rel p95':>13}{'esperado':>10}")
+    for itype in merged.config["distinct_types"]:
+        rel = []
+        for (t, product), users in exact_users.items():
+            if t == itype and len(users) >= 20:
+                rel.append(abs(distinct_users(merged, product, itype) - len(users)) / len(users))
+        if not rel:
+            continue
+        rel.sort()
+        expected = 1.04 / (2 ** merged.config["hll_p"]) ** 0.5
+        print(f"{itype:<10}{len(rel):>10}{statistics.mean(rel):>15.3f}"
+              f"{rel[int(0.95 * (len(rel) - 1))]:>13.3f}{expected:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from snapshot import GLOBAL_KEY, SnapshotReader, write_snapshot
+
+# Benchmark del snapshot de recomendaciones con datos sintéticos (sin Dgraph): tiempo de
+# construcción, tamaño y latencia de lookup, también mientras otro hilo reemplaza el
+# archivo en caliente.
+
+
+def synthetic_sections(n_users, n_products, k, seed=42):
+    rng = random.Random(seed)
+    products = [0x1000 + i for i in range(n_products)]
+    users = [0x100000 + i for i in range(n_users)]
+
+    def recs():
+        return [(p, rng.random()) for p in rng.sample(products, k)]
+
+    sections = {
+        "history": {u: recs() for u in users},
+        "similar": {u: recs() for u in users},
+        "copurchase": {p: recs() for p in products},
+        "top_rated": {GLOBAL_KEY: recs()},
+        "trending": {GLOBAL_KEY: recs()},
+    }
+    catalog = {p: {"name": f"Product {p}", "category": "Posters", "price": 9.99} for p in products}
+    return sections, catalog, users
+
+
+def measure(reader, users, n):
+    rng = random.Random(7)
+    latencies = []
+    for _ in range(n):
+        uid = rng.choice(users)
+        start = time.perf_counter_ns()
+        items, scores = reader.lookup("history", uid)
+        items[0], scores[0]
+        latencies.append(time.perf_counter_ns() - start)
+    latencies.sort()
+    return {
+        "p50_us": latencies[len(latencies) // 2] / 1000,
+        "p99_us": latencies[int(len(latencies) * 0.99)] / 1000,
+        "mean_us": statistics.mean(latencies) / 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del snapshot de recomendaciones")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    sections, catalog, users = synthetic_sections(args.users, args.products, args.top_k)
+    path = os.path.join(tempfile.mkdtemp(), "bench.snap")
+    try:
+        start = time.perf_counter()
+        write_snapshot(path, sections, catalog)
+        build_s = time.perf_counter() - start
+        print(f"Construcción: {build_s:.2f}s, {os.path.getsize(path) / 1024 / 1024:.1f} MiB "
+              f"({args.users} usuarios, {args.products} productos, k={args.top_k})")
+
+        start = time.perf_counter()
+        reader = SnapshotReader(path, check_interval=0.01)
+        print(f"Apertura (mmap): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        r = measure(reader, users, args.lookups)
+        print(f"Lookup: p50 {r['p50_us']:.1f} µs, p99 {r['p99_us']:.1f} µs, media {r['mean_us']:.1f} µs")
+
+        # Reemplazos en caliente mientras se sirve
+        swaps = []
+        stop = threading.Event()
+
+        def swapper():
+            while not stop.is_set():
+                swaps.append(write_snapshot(path, sections, catalog))
+
+        thread = threading.Thread(target=swapper)
+        thread.start()
+        try:
+            r = measure(reader, users, args.lookups)
+        finally:
+            stop.set()
+            thread.join()
+        print(f"Lookup con {len(swaps)} reemplazos en curso: p50 {r['p50_us']:.1f} µs, "
+              f"p99 {r['p99_us']:.1f} µs, media {r['mean_us']:.1f} µs")
+        reader.reload_if_changed()
+        print(f"Versión servida al final: {'última' if reader.version == swaps[-1] else 'anterior'}")
+    finally:
+        for name in os.listdir(os.path.dirname(path)):
+            os.remove(os.path.join(os.path.dirname(path), name))
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import collections
+import contextlib
+import functools
+import gc
+import io
+import json
+import operator
+import threading
+
+# Decodificadores opcionales: se usan si están instalados
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# A partir de este tamaño (bytes) se decodifica en modo incremental si hay ijson. Es el
+# único camino que baja el pico de memoria (no construye el árbol; el de orjson ocupa
+# incluso más que el de json.loads), pero tarda casi el doble: solo compensa en
+# respuestas sin límite de tamaño. Las páginas de la API y de iter_node_pages quedan muy
+# por debajo y van por orjson + proyección, que es lo más rápido.
+STREAMING_THRESHOLD = 64 * 1024 * 1024
+
+
+def decoder_name():
+    """Nombre del decodificador JSON que se está usando."""
+    if orjson is not None:
+        return "orjson"
+    if simdjson is not None:
+        return "simdjson"
+    return "json"
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Pausa el recolector cíclico mientras se decodifica: una respuesta grande crea
+    cientos de miles de contenedores y dispara recolecciones que no liberan nada.
+    gc.disable() afecta a todo el proceso, así que solo se pausa con un único hilo
+    (main.py); en pools (snapshot.py, stress.py) otro hilo podría reactivarlo a mitad.
+    """
+    if threading.active_count() > 1 or not gc.isenabled():
+        yield
+        return
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def loads(raw):
+    """Decodifica una respuesta completa de Dgraph con el decodificador más rápido disponible."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    if simdjson is not None:
+        return simdjson.loads(raw)
+    return json.loads(raw)
+
+
+# Registros compactos
+class Record:
+    """Mixin de los registros (namedtuple): admite además r['campo'] y r.get('campo') como un dict."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            # Solo los campos: getattr también encontraría count, index, _asdict...
+            if key not in self._field_set:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+
+def record_type(name, fields):
+    """Crea un namedtuple con los campos indicados y el acceso por clave de Record."""
+    fields = tuple(fields)
+    return type(name, (Record, collections.namedtuple(name, fields)),
+                {"__slots__": (), "_field_set": frozenset(fields)})
+
+
+# Proyección
+class Projection:
+    """
+    Describe qué registros extraer de una respuesta.
+
+    block: nombre del bloque raíz de la query (ej. "user").
+    path: aristas a recorrer dentro de cada nodo raíz hasta la lista de items
+          (ej. ["~by_user"]). Vacío si los items son los nodos raíz.
+    fields: dict campo -> ruta dentro del item (str o tupla de aristas).
+            En aristas [uid] se toma el primer elemento.
+    """
+
+    def __init__(self, block, path, fields, name="Row"):
+        self.block = block
+        self.path = list(path)
+        self.fields = {f: (p,) if isinstance(p, str) else tuple(p) for f, p in fields.items()}
+        self.record = record_type(name, self.fields)
+        self.build = _builder(self.fields, self.record)
+
+    def ijson_prefix(self):
+        return ".".join([self.block, "item"] + [f"{edge}.item" for edge in self.path])
+
+
+def _builder(fields, record):
+    """
+    Devuelve build(item) para una proyección: cada arista anidada se resuelve una sola
+    vez por item aunque varios campos cuelguen de ella, y los campos de un mismo nodo se
+    leen juntos con map(node.get, claves).
+    """
+    # Nodo 0: el propio item; steps: (nodo padre, arista, claves a leer del nodo)
+    keys = {(): []}
+    steps = []
+    edges = {(): 0}
+    for path in fields.values():
+        for depth in range(1, len(path)):
+            prefix = path[:depth]
+            if prefix not in edges:
+                edges[prefix] = len(steps) + 1
+                keys[prefix] = []
+                steps.append((edges[path[:depth - 1]], prefix[-1], keys[prefix]))
+        keys[path[:-1]].append(path[-1])
+
+    # Los valores se leen agrupados por nodo (en el orden de `keys`, que es el de steps)
+    # y se reordenan al orden de los campos si no coinciden
+    read_order = [prefix + (key,) for prefix, node_keys in keys.items() for key in node_keys]
+    order = [read_order.index(path) for path in fields.values()]
+    new = functools.partial(tuple.__new__, record)
+    if order == list(range(len(order))):
+        make = new
+    elif len(order) > 1:
+        reorder = operator.itemgetter(*order)
+        make = lambda values: new(reorder(values))  # noqa: E731
+    else:
+        make = lambda values: new((values[0],))  # noqa: E731
+    top = keys[()]
+
+    if not steps:
+        return lambda item: make(list(map(item.get, top)))
+
+    if all(parent == 0 for parent, _, _ in steps):
+        # Caso habitual: aristas de un solo nivel (with_product { ... })
+        edges = [(edge, node_keys, [None] * len(node_keys)) for _, edge, node_keys in steps]
+
+        def build(item):
+            values = list(map(item.get, top))
+            for edge, node_keys, missing in edges:
+                node = item.get(edge)
+                if node.__class__ is list:
+                    node = node[0] if node else None
+                values += missing if node is None else map(node.get, node_keys)
+            return make(values)
+
+        return build
+
+    def build(item):
+        nodes = [item]
+        values = list(map(item.get, top))
+        for parent, edge, node_keys in steps:
+            node = nodes[parent]
+            node = node.get(edge) if node is not None else None
+            if node.__class__ is list:
+                node = node[0] if node else None
+            nodes.append(node)
+            if node is None:
+                values += [None] * len(node_keys)
+            else:
+                values += map(node.get, node_keys)
+        return make(values)
+
+    return build
+
+
+def _walk(nodes, path, consume):
+    for i, node in enumerate(nodes):
+        if consume:
+            # Suelta la referencia de la lista para que cada dict se libere al proyectarlo
+            nodes[i] = None
+        if path:
+            yield from _walk(node.get(path[0], []), path[1:], consume)
+        else:
+            yield node
+
+
+def project(data, projection, consume=False):
+    """
+    Aplana una respuesta ya decodificada a registros compactos.
+    Con consume=True el árbol se va vaciando mientras se recorre y cada dict se libera
+    al convertirlo en registro; el pico sigue siendo el del árbol completo.
+    """
+    for item in _walk(data.get(projection.block, []), projection.path, consume):
+        yield projection.build(item)
+
+
+def iter_records(raw, projection, streaming=None):
+    """
+    Decodifica y proyecta una respuesta. En modo incremental (ijson) cada item se
+    convierte en registro y se descarta, sin construir el árbol completo.
+    streaming=None decide según STREAMING_THRESHOLD; sin ijson cae a loads() + project().
+    """
+    if streaming is None:
+        streaming = len(raw) >= STREAMING_THRESHOLD
+    if streaming and ijson is not None:
+        stream = io.BytesIO(raw if isinstance(raw, bytes) else raw.encode("utf-8"))
+        for item in ijson.items(stream, projection.ijson_prefix(), use_float=True):
+            yield projection.build(item)
+    else:
+        yield from project(loads(raw), projection, consume=True)
+
+
+def decode_records(raw, projection, streaming=None):
+    """Lista de registros de una respuesta (ver iter_records)."""
+    with gc_paused():
+        return list(iter_records(raw, projection, streaming))
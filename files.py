@@ -0,0 +1,24 @@
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Abre un temporal junto a `path` y lo renombra sobre `path` al cerrar el bloque:
+    un lector nunca ve el archivo a medias, y el fsync previo evita que una caída deje
+    un archivo vacío tras el renombrado. Si el bloque falla se borra el temporal y
+    `path` queda como estaba.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
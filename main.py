@@ -1,5 +1,8 @@
 import pydgraph
+import datetime
+import itertools
 import json
+import math
 import os
 
 from model import (
@@ -13,7 +16,9 @@ from model import (
     get_most_purchased_products,
     get_most_viewed_products,
     get_similar_users,
-    get_history_recommendations
+    get_history_recommendations,
+    get_user_dashboard,
+    search_reviews
 )
 
 from populate import (
@@ -24,6 +29,10 @@ from populate import (
     load_carts
 )
 
+from sketches import InteractionSketches
+
+SKETCHES_PATH = "sketches.json"
+
 # Conexión 
 def connect_dgraph():
     client_stub = pydgraph.DgraphClientStub('localhost:9080')
@@ -33,6 +42,8 @@ def connect_dgraph():
 def drop_data(client):
     op = pydgraph.Operation(drop_all=True)
     client.alter(op)
+    if os.path.exists(SKETCHES_PATH):
+        os.remove(SKETCHES_PATH)
     print("🧹 Datos y Schema borrados.")
 
 # Menú 
@@ -40,6 +51,74 @@ def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
     
 
+# Muestra una lista paginada; pide confirmación antes de traer la siguiente página
+def show_pages(fetch, render, empty_message):
+    cursor = None
+    shown = 0
+    while True:
+        page = fetch(cursor)
+        if not shown and not page["items"]:
+            print(empty_message)
+            return
+        for item in page["items"]:
+            render(item)
+        shown += len(page["items"])
+        cursor = page["next_cursor"]
+        if not cursor or input("\n¿Ver más? (s/n): ").strip().lower() != "s":
+            return
+
+
+# Pide un número opcional; vuelve a preguntar hasta que sea válido (vacío = None)
+def ask_number(prompt):
+    while True:
+        value = input(prompt).strip()
+        if not value:
+            return None
+        try:
+            number = float(value)
+        except ValueError:
+            number = None
+        if number is not None and math.isfinite(number):
+            return number
+        print("⚠️ Ingrese un número válido.")
+
+
+# Filtros opcionales de precio/categoría para las recomendaciones
+def ask_product_filters():
+    if input("¿Filtrar por precio o categoría? (s/n): ").strip().lower() != "s":
+        return {}
+    min_price = ask_number("Precio mínimo (vacío = sin mínimo): ")
+    max_price = ask_number("Precio máximo (vacío = sin máximo): ")
+    categories = input("Categorías separadas por ; (vacío = todas): ").strip()
+    return {
+        "min_price": min_price,
+        "max_price": max_price,
+        "categories": [c.strip() for c in categories.split(";") if c.strip()] or None,
+    }
+
+
+# Pide una fecha opcional; vuelve a preguntar hasta que sea válida (vacío = None)
+def ask_date(prompt):
+    while True:
+        value = input(prompt).strip()
+        if not value:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            print("⚠️ Ingrese una fecha válida (YYYY-MM-DD).")
+
+
+# Ventana de tiempo opcional para los rankings (lee los buckets de rollup)
+def ask_window():
+    since = ask_date("Desde (YYYY-MM-DD, vacío = todo el historial): ")
+    until = ask_date("Hasta (YYYY-MM-DD, vacío = sin límite): ")
+    return {
+        "since": f"{since.isoformat()}T00:00:00Z" if since else None,
+        "until": f"{until.isoformat()}T23:59:59Z" if until else None,
+    }
+
+
 def print_menu():
     print("══════════════════════════════════════")
     print("               DATABASE               ")
@@ -56,6 +135,8 @@ def print_menu():
     print("10. Productos mejor calificados")
     print("11. Productos en tendencia")
     print("12. Borrar datos")
+    print("13. Buscar reseñas por texto")
+    print("14. Panel de usuario")
     print("0. Salir")
     print("══════════════════════════════════════")
 
@@ -93,7 +174,9 @@ def main():
             print("✔ Reviews loaded.\n")
             
             print("Loading INTERACTIONS...\n")
-            interactions = load_interactions(client, "data/interactions.csv", user_uid_map, product_uid_map)
+            sketches = InteractionSketches.load(SKETCHES_PATH) if os.path.exists(SKETCHES_PATH) else InteractionSketches()
+            interactions = load_interactions(client, "data/interactions.csv", user_uid_map, product_uid_map, sketches)
+            sketches.save(SKETCHES_PATH)
             print(json.dumps(scalar_map_to_dict(interactions), indent=4, ensure_ascii=False))
             print("✔ Interactions loaded.\n")
             
@@ -106,112 +189,136 @@ def main():
 
         elif choice == "3":
             product_name = input("Ingrese el nombre EXACTO del producto: ")
-            reviews = get_reviews(client, product_name)
             print(f"\nReseñas para el producto: {product_name}\n")
-            if not reviews:
-                print("No se encontraron reseñas.\n")
-            else:
-                for i, r in enumerate(reviews, start=1):
-                    print(f"Reseña #{i}")
-                    print(f"Calificación: {r.get('rating')}")
-                    print(f"Comentario: {r.get('comment')}")
-                    print(f"Fecha: {r.get('review_created_at')}")
-                    reviewers = r.get("reviewed_by", [])
-                    if reviewers:
-                        for rv in reviewers:
-                            print(f"Usuario: {rv.get('name')}")
-                    print("-" * 50)
+            counter = itertools.count(1)
+
+            def print_review(r):
+                print(f"Reseña #{next(counter)}")
+                print(f"Calificación: {r.get('rating')}")
+                print(f"Comentario: {r.get('comment')}")
+                print(f"Fecha: {r.get('review_created_at')}")
+                if r.get("reviewer"):
+                    print(f"Usuario: {r.get('reviewer')}")
+                print("-" * 50)
+
+            show_pages(lambda cursor: get_reviews(client, product_name, limit=5, cursor=cursor),
+                       print_review, "No se encontraron reseñas.\n")
 
 
         elif choice == "4":
             email = input("Ingrese EMAIL del usuario: ")
-            res = get_user_interactions(client, email)
-        
-            if not res:
-                print(f"\nNo se encontraron interacciones para el usuario con email: {email}\n")
-            else:
-                print("\nInteracciones:\n")
-                for inter in res:
-                    products = inter.get("with_product", [])
-                    if products:  
-                        product = products[0]
-                        print(f"- {inter['interaction_type']} en {product.get('name')} "
-                              f"(duración: {inter['duration']}s, fecha: {inter['timestamp']})")
-                    else:
-                        print(f"- {inter['interaction_type']} (sin producto enlazado)")
+
+            def print_interaction(inter):
+                if inter.get("product_name"):
+                    print(f"- {inter['interaction_type']} en {inter['product_name']} "
+                          f"(duración: {inter['duration']}s, fecha: {inter['timestamp']})")
+                else:
+                    print(f"- {inter['interaction_type']} (sin producto enlazado)")
+
+            print("\nInteracciones:\n")
+            show_pages(lambda cursor: get_user_interactions(client, email, limit=10, cursor=cursor),
+                       print_interaction,
+                       f"No se encontraron interacciones para el usuario con email: {email}\n")
 
 
         elif choice == "5":
             email = input("Ingrese el EMAIL del usuario: ").strip().lower()
-            recs = get_history_recommendations(client, email)
+            filters = ask_product_filters()
             print("\nRecomendaciones basadas en historial de compras: \n")
-            if not recs:
-                print("No se encontraron recomendaciones.\n")
-            else:
-                for r in recs[:3]:  # 👈 top 3
-                    print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']})")
+            show_pages(lambda cursor: get_history_recommendations(client, email, limit=3, cursor=cursor, **filters),
+                       lambda r: print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']})"),
+                       "No se encontraron recomendaciones.\n")
 
 
         elif choice == "6":
             product_name = input("Ingrese el nombre EXACTO del producto: ")
-            res = get_copurchased_products(client, product_name)
+            filters = ask_product_filters()
             print(f"\nProductos que suelen comprarse junto con {product_name}:\n")
-            if not res:
-                print("No se encontraron productos copurchased.\n")
-            else:
-                for r in res[:10]:
-                    print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']}, co-purchase: {r['count']})")
+            show_pages(lambda cursor: get_copurchased_products(client, product_name, limit=10, cursor=cursor, **filters),
+                       lambda r: print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']}, co-purchase: {r['count']})"),
+                       "No se encontraron productos copurchased.\n")
 
 
         elif choice == "7":
-            res = get_most_purchased_products(client)
+            window = ask_window()
             print("\nProductos más comprados:\n")
-            if not res:
-                print("No se encontraron interacciones de tipo 'purchase'.\n")
-            else:
-                for p in res[:3]:  # mostrar los 3primeros
-                    print(f"- {p['name']} ({p['purchases']} compras, categoría: {p['category']}, precio: {p['price']})")
-
+            show_pages(lambda cursor: get_most_purchased_products(client, limit=3, cursor=cursor, **window),
+                       lambda p: print(f"- {p['name']} ({p['purchases']} compras, categoría: {p['category']}, precio: {p['price']})"),
+                       "No se encontraron interacciones de tipo 'purchase'.\n")
 
 
         elif choice == "8":
-            res = get_most_viewed_products(client)
+            window = ask_window()
             print("\nProductos más vistos:\n")
-            if not res:
-                print("No se encontraron interacciones de tipo 'view'.\n")
-            else:
-                for p in res[:3]:  # mostrar los 3 primeros
-                    print(f"- {p['name']} ({p['views']} vistas, categoría: {p['category']}, precio: {p['price']})")
+            show_pages(lambda cursor: get_most_viewed_products(client, limit=3, cursor=cursor, **window),
+                       lambda p: print(f"- {p['name']} ({p['views']} vistas, categoría: {p['category']}, precio: {p['price']})"),
+                       "No se encontraron interacciones de tipo 'view'.\n")
 
 
         elif choice == "9":
             email = input("Ingrese el EMAIL del usuario: ").strip().lower()
-            recs = get_similar_users(client, email)
+            filters = ask_product_filters()
             print(f"\nRecomendaciones basadas en usuarios similares para {email}:\n")
-            if not recs:
-                print("No se encontraron recomendaciones.\n")
-            else:
-                for r in recs[:3]:
-                    print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']}, score: {r['score']})")
+            show_pages(lambda cursor: get_similar_users(client, email, limit=3, cursor=cursor, **filters),
+                       lambda r: print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']}, score: {r['score']})"),
+                       "No se encontraron recomendaciones.\n")
 
 
         elif choice == "10":
-            res = get_top_rated_products(client)
             print("\nProductos Mejor Calificados:\n")
-            for p in res[:5]:  # mostrar los 5 primeros
-                print(f"- {p['name']} (⭐ {p['avg_rating']} con {p['num_reviews']} reseñas)")
+            show_pages(lambda cursor: get_top_rated_products(client, limit=5, cursor=cursor),
+                       lambda p: print(f"- {p['name']} (⭐ {round(p['avg_rating'], 2)} con {p['num_reviews']} reseñas)"),
+                       "No se encontraron reseñas.\n")
 
 
         elif choice == "11":
-            res = get_trending_products(client)
+            window = ask_window()
             print("\nProductos en tendencia:\n")
-            for p in res[:5]:  # mostrar los 5 primeros
-                print(f"- {p['name']} ({p['views']} vistas, {p['clicks']} clicks, {p['purchases']} compras, score popularidad: {p['total']})")
+            show_pages(lambda cursor: get_trending_products(client, limit=5, cursor=cursor, **window),
+                       lambda p: print(f"- {p['name']} ({p['views']} vistas, {p['clicks']} clicks, {p['purchases']} compras, score popularidad: {p['total']})"),
+                       "No se encontraron interacciones.\n")
 
 
         elif choice == "12":
             drop_data(client)
 
+        elif choice == "13":
+            text = input("Palabras a buscar (vacío = todas): ").strip() or None
+            mode = "all" if input("¿Todas las palabras? (s/n): ").strip().lower() == "s" else "any"
+            min_rating = ask_number("Rating mínimo (vacío = sin filtro): ")
+            order_by = "rating" if input("Ordenar por (fecha/rating): ").strip().lower() == "rating" else "date"
+
+            total = search_reviews(client, text, mode, min_rating=min_rating, count_only=True)
+            print(f"\n{total} reseñas encontradas.\n")
+
+            def print_found_review(r):
+                print(f"- ⭐ {r['rating']} | {r['product_name']} | {r['reviewer']} | {r['review_created_at']}")
+                print(f"  {r['comment']}")
+
+            if total:
+                show_pages(lambda cursor: search_reviews(client, text, mode, min_rating=min_rating,
+                                                         order_by=order_by, limit=5, cursor=cursor),
+                           print_found_review, "")
+
+        elif choice == "14":
+            email = input("Ingrese el EMAIL del usuario: ").strip().lower()
+            filters = ask_product_filters()
+            dashboard = get_user_dashboard(client, email, limit=5, **filters)
+            if not dashboard["user"]:
+                print(f"\nNo se encontró el usuario con email: {email}\n")
+            else:
+                print(f"\nPanel de {dashboard['user']['name']} ({email})\n")
+                print("Interacciones recientes:")
+                for inter in dashboard["interactions"]["items"]:
+                    print(f"- {inter['interaction_type']} en {inter['product_name']} "
+                          f"(duración: {inter['duration']}s, fecha: {inter['timestamp']})")
+                print("\nPor historial de compras:")
+                for r in dashboard["history"]["items"]:
+                    print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']})")
+                print("\nPor usuarios similares:")
+                for r in dashboard["similar"]["items"]:
+                    print(f"- {r['name']} (categoría: {r['category']}, precio: {r['price']}, score: {r['score']})")
+
         elif choice == "0":
             print("\n👋 Saliendo del programa...\n")
             break
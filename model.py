@@ -1,10 +1,14 @@
 
 import datetime
-import json
+import math
 
 
 import pydgraph
 
+from decode import Projection, decode_records, loads, project
+from pagination import clamp_limit, decode_cursor, keyset_page, uid_literal, uid_page
+from rollup import bucket_start
+
 def set_schema(client):
     schema = """
     # Tipos de Nodos
@@ -16,6 +20,7 @@ def set_schema(client):
         purchased
         interacted
         has_cart
+        recommended
     }
     
     type Product {
@@ -48,6 +53,17 @@ def set_schema(client):
         contains
     }
     
+    type InteractionBucket {
+        bucket_key
+        granularity
+        bucket_start
+        bucket_product
+        bucket_views
+        bucket_clicks
+        bucket_purchases
+        bucket_duration
+    }
+    
     # Índices 
     # User 
     name: string @index(term) .
@@ -58,6 +74,7 @@ def set_schema(client):
     purchased: [uid] @reverse .
     interacted: [uid] @reverse .
     has_cart: [uid] @reverse .
+    recommended: [uid] .              # top-k de ppr.py, facet score
     
     
     # Product
@@ -89,6 +106,17 @@ def set_schema(client):
     # Cart
     cart_created_at: datetime @index(day) .
     contains: [uid] @reverse .       
+    
+    
+    # InteractionBucket (rollup por producto y día/hora, ver rollup.py)
+    bucket_key: string @index(exact) @upsert .
+    granularity: string @index(exact) .
+    bucket_start: datetime @index(hour) .
+    bucket_product: [uid] @reverse .
+    bucket_views: int .
+    bucket_clicks: int .
+    bucket_purchases: int .
+    bucket_duration: float .
     """
     return client.alter(pydgraph.Operation(schema=schema))
     
@@ -103,16 +131,136 @@ def scalar_map_to_dict(scalar_map):
     else:
         return scalar_map 
 
+# Proyecciones: cada query se aplana directamente a registros compactos
+REVIEW_FIELDS = Projection("product", ["~of_product"], {
+    "uid": "uid",
+    "rating": "rating",
+    "comment": "comment",
+    "review_created_at": "review_created_at",
+    "reviewer": ("reviewed_by", "name"),
+}, name="Review")
+
+INTERACTION_FIELDS = Projection("user", ["~by_user"], {
+    "uid": "uid",
+    "interaction_type": "interaction_type",
+    "timestamp": "timestamp",
+    "duration": "duration",
+    "product_uid": ("with_product", "uid"),
+    "product_name": ("with_product", "name"),
+    "category": ("with_product", "category"),
+    "price": ("with_product", "price"),
+}, name="Interaction")
+
+PRODUCT_FIELDS = {"uid": "uid", "name": "name", "category": "category", "price": "price"}
+RECOMMENDED = Projection("products", [], PRODUCT_FIELDS, name="Product")
+COPURCHASED = Projection("products", [], {**PRODUCT_FIELDS, "count": "count"}, name="CopurchasedProduct")
+SIMILAR_USERS_PRODUCT = Projection("products", [], {**PRODUCT_FIELDS, "score": "score"}, name="ScoredProduct")
+MOST_PURCHASED = Projection("products", [], {**PRODUCT_FIELDS, "purchases": "purchases"}, name="PurchasedProduct")
+MOST_VIEWED = Projection("products", [], {**PRODUCT_FIELDS, "views": "views"}, name="ViewedProduct")
+TOP_RATED = Projection("products", [], {
+    **PRODUCT_FIELDS, "avg_rating": "avg_rating", "num_reviews": "num_reviews",
+}, name="RatedProduct")
+TRENDING = Projection("products", [], {
+    **PRODUCT_FIELDS, "views": "views", "clicks": "clicks", "purchases": "purchases", "total": "total",
+}, name="TrendingProduct")
+
+DASHBOARD_HISTORY = Projection("history", [], PRODUCT_FIELDS, name="Product")
+DASHBOARD_SIMILAR = Projection("similar", [], {**PRODUCT_FIELDS, "score": "score"}, name="ScoredProduct")
+
+SEARCHED_REVIEW = Projection("reviews", [], {
+    "uid": "uid",
+    "rating": "rating",
+    "comment": "comment",
+    "review_created_at": "review_created_at",
+    "product_uid": ("of_product", "uid"),
+    "product_name": ("of_product", "name"),
+    "category": ("of_product", "category"),
+    "price": ("of_product", "price"),
+    "reviewer": ("reviewed_by", "name"),
+    "reviewer_email": ("reviewed_by", "email"),
+}, name="SearchedReview")
+
+
+# Paginación
+# Todas las listas devuelven {"items": [...], "next_cursor": ...}. Las ordenadas por uid
+# usan first/after; las ordenadas por un valor agregado usan un cursor keyset.
+def _after_clause(state):
+    return f", after: {uid_literal(state['after'])}" if state else ""
+
+
+def _keyset_clause(state, var_name):
+    """Filtro y offset para continuar una lista ordenada desc por val(var_name)."""
+    if not state:
+        return "", 0
+    value = state.get("value")
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError("Cursor inválido")
+    return f" AND le(val({var_name}), {value!r})", state.get("ties", 0)
+
+
+# Variables de query: pydgraph recibe todos los valores como str y la cabecera declara
+# solo las variables que la query usa
+class _QueryVariables:
+    def __init__(self):
+        self.values = {}
+        self.declared = []
+
+    def add(self, name, dql_type, value):
+        """Registra $name y devuelve su nombre para interpolarlo en la query."""
+        self.values[f"${name}"] = str(value)
+        self.declared.append(f"${name}: {dql_type}")
+        return f"${name}"
+
+    def declaration(self):
+        return ", ".join(self.declared)
+
+
+# Filtros de producto sobre los índices price @index(float) y category @index(exact)
+def _product_filter(params, min_price=None, max_price=None, categories=None, exclude=None):
+    """
+    Cláusulas DQL (unidas con AND) para filtrar productos dentro de la query; precios y
+    categorías se registran en `params` (_QueryVariables). Los uids de `exclude` ya se
+    validan con uid_literal.
+    """
+    clauses = []
+    prices = {}
+    for name, value in (("min_price", min_price), ("max_price", max_price)):
+        if value is not None:
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError(f"{name} debe ser un número finito")
+            prices[name] = params.add(name, "float", value)
+    if len(prices) == 2:
+        clauses.append(f"between(price, {prices['min_price']}, {prices['max_price']})")
+    elif "min_price" in prices:
+        clauses.append(f"ge(price, {prices['min_price']})")
+    elif "max_price" in prices:
+        clauses.append(f"le(price, {prices['max_price']})")
+    if categories:
+        names = [params.add(f"c{i}", "string", c) for i, c in enumerate(categories)]
+        clauses.append(f"eq(category, [{', '.join(names)}])")
+    if exclude:
+        clauses.append(f"NOT uid({', '.join(uid_literal(u) for u in exclude)})")
+    return clauses
+
+
+def _and(*clauses):
+    return " AND ".join(c for c in clauses if c)
+
+
 # 3. Obtener reseñas de un producto
-def get_reviews(client, product_name):
-    txn = client.txn()
+def get_reviews(client, product_name, limit=None, cursor=None):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    txn = client.txn(read_only=True)
     try:
         query = f"""
-        {{
-            product(func: eq(name, "{product_name}")) {{
+        query reviews($name: string) {{
+            product(func: eq(name, $name), first: 1) {{
                 uid
                 name
-                ~of_product {{
+                ~of_product (first: {limit + 1}{_after_clause(state)}) {{
+                    uid
                     rating
                     comment
                     review_created_at
@@ -123,27 +271,24 @@ def get_reviews(client, product_name):
             }}
         }}
         """
-        res = txn.query(query)
-        data = json.loads(res.json)
-        product_data = data.get("product", [])
-        reviews = []
-        for p in product_data:
-            reviews.extend(p.get("~of_product", []))
-        return reviews
+        res = txn.query(query, variables={"$name": product_name})
+        return uid_page(decode_records(res.json, REVIEW_FIELDS), limit)
     finally:
         txn.discard()
 
 # 4. Registro de interacciones (view, click, purchase)
-def get_user_interactions(client, user_email):
-    txn = client.txn()
+def get_user_interactions(client, user_email, limit=None, cursor=None):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    txn = client.txn(read_only=True)
     try:
         query = f"""
-        {{
-            user(func: eq(email, "{user_email}")) {{
+        query interactions($email: string) {{
+            user(func: eq(email, $email), first: 1) {{
                 uid
                 name
                 email
-                ~by_user {{
+                ~by_user (first: {limit + 1}{_after_clause(state)}) {{
                     uid
                     interaction_type
                     timestamp
@@ -158,376 +303,446 @@ def get_user_interactions(client, user_email):
             }}
         }}
         """
-        res = txn.query(query)
-        data = json.loads(res.json)
-
-        user_data = data.get("user", [])
-        interactions = []
-        for u in user_data:
-            interactions.extend(u.get("~by_user", []))
-
-        return interactions
+        res = txn.query(query, variables={"$email": user_email})
+        return uid_page(decode_records(res.json, INTERACTION_FIELDS), limit)
     finally:
         txn.discard()
 
 
-# 5. Recomendación basada en historial de compras
-def get_history_recommendations(client, user_email):
-    txn = client.txn()
-    try:
-        query = f"""
-        {{
-          user(func: eq(email, "{user_email}")) {{
+# Bloques DQL compartidos por las recomendaciones por usuario y el panel (get_user_dashboard)
+def _purchases_block(me=False, categories=False):
+    """Bloque var que resuelve al usuario $email: bought (y opcionalmente me, categories)."""
+    me_var = "\n            me as uid" if me else ""
+    category_var = " {\n                categories as category\n              }" if categories else ""
+    return f"""
+          var(func: eq(email, $email), first: 1) {{{me_var}
+            ~has_cart {{
+              bought as contains{category_var}
+            }}
+          }}"""
+
+
+def _history_block(name, product_filter, first, after=""):
+    """Productos de las mismas categorías que lo comprado (usa bought y categories)."""
+    return f"""
+          {name}(func: eq(category, val(categories)), first: {first}{after}) @filter({product_filter}) {{
+            uid
             name
+            category
+            price
+          }}"""
+
+
+def _similar_blocks(name, product_filter, first, offset=0, keyset=""):
+    """score = nº de veces que otros usuarios compraron cada producto (usa me y bought)."""
+    return f"""
+          var(func: has(email)) @filter(NOT uid(me)) {{
+            paths as math(1)
             ~has_cart {{
-              contains {{
-                name
-                category
-                price
+              contains @filter({product_filter}) {{
+                score as math(paths)
               }}
             }}
           }}
 
-          products(func: has(category)) {{
+          {name}(func: uid(score), orderdesc: val(score), first: {first}, offset: {offset}) @filter(has(category){keyset}) {{
+            uid
             name
             category
             price
-          }}
+            score: val(score)
+          }}"""
+
+
+# 5. Recomendación basada en historial de compras
+def get_history_recommendations(client, user_email, limit=None, cursor=None,
+                                min_price=None, max_price=None, categories=None, exclude=None):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    params = _QueryVariables()
+    params.add("email", "string", user_email)
+    product_filter = _and("NOT uid(bought)", *_product_filter(params, min_price, max_price, categories, exclude))
+    txn = client.txn(read_only=True)
+    try:
+        # Productos de las mismas categorías que lo comprado, sin lo ya comprado
+        query = f"""
+        query history({params.declaration()}) {{{_purchases_block(categories=True)}
+{_history_block("products", product_filter, limit + 1, _after_clause(state))}
         }}
         """
-        res = txn.query(query)
-        data = json.loads(res.json)
-
-        # Productos comprados por el usuario
-        purchased = set()
-        categories = set()
-        for u in data.get("user", []):
-            for cart in u.get("~has_cart", []):
-                for prod in cart.get("contains", []):
-                    purchased.add(prod["name"])
-                    categories.add(prod["category"])
-
-        # Filtrar productos similares por categoría
-        recommendations = []
-        for prod in data.get("products", []):
-            if prod["category"] in categories and prod["name"] not in purchased:
-                recommendations.append({
-                    "name": prod["name"],
-                    "category": prod["category"],
-                    "price": prod["price"]
-                })
-
-        return recommendations
+        res = txn.query(query, variables=params.values)
+        return uid_page(decode_records(res.json, RECOMMENDED), limit)
     finally:
         txn.discard()
 
 
 
 # 6. Recomendación basada en productos comprados juntos (co-purchase)
-def get_copurchased_products(client, product_name):
-    txn = client.txn()
+def get_copurchased_products(client, product_name, limit=None, cursor=None,
+                             min_price=None, max_price=None, categories=None, exclude=None):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    keyset, offset = _keyset_clause(state, "together")
+    # El filtro va en la arista contains: los productos descartados ni siquiera suman
+    params = _QueryVariables()
+    params.add("name", "string", product_name)
+    product_filter = _and(*_product_filter(params, min_price, max_price, categories, exclude))
+    contains_filter = f" @filter({product_filter})" if product_filter else ""
+    txn = client.txn(read_only=True)
     try:
+        # paths suma un camino por cada carrito compartido: together = nº de carritos
         query = f"""
-        {{
-            product(func: eq(name, "{product_name}")) {{
-                uid
-                name
+        query copurchase({params.declaration()}) {{
+            var(func: eq(name, $name)) {{
+                target as uid
+                paths as math(1)
                 ~contains {{
-                    uid
-                    cart_created_at
-                    contains {{
-                        uid
-                        name
-                        category
-                        price
+                    contains{contains_filter} {{
+                        together as math(paths)
                     }}
                 }}
             }}
+
+            products(func: uid(together), orderdesc: val(together), first: {limit + 1}, offset: {offset}) @filter(NOT uid(target){keyset}) {{
+                uid
+                name
+                category
+                price
+                count: val(together)
+            }}
         }}
         """
-        res = txn.query(query)
-        data = json.loads(res.json)
-
-        product_data = data.get("product", [])
-        copurchased = {}
-
-        for p in product_data:
-            for cart in p.get("~contains", []):
-                for other in cart.get("contains", []):
-                    if other["name"] != product_name:
-                        uid = other["uid"]
-                        if uid not in copurchased:
-                            copurchased[uid] = {
-                                "uid": uid,
-                                "name": other["name"],
-                                "category": other.get("category"),
-                                "price": other.get("price"),
-                                "count": 0
-                            }
-                        copurchased[uid]["count"] += 1
-
-        return sorted(copurchased.values(), key=lambda x: x["count"], reverse=True)
+        res = txn.query(query, variables=params.values)
+        return keyset_page(decode_records(res.json, COPURCHASED), limit, "count", state)
     finally:
         txn.discard()
 
 
 # Productos Populares
-# 7. Más comprados
-def get_most_purchased_products(client):
-    txn = client.txn()
+# Los rankings leen los buckets de rollup.py (producto × día/hora) de la ventana pedida,
+# no los eventos: el coste crece con productos × buckets, no con el número de interacciones.
+def _bucket_window(granularity, since, until):
+    """
+    Función raíz, filtro y variables para seleccionar los buckets de una ventana.
+    La ventana es de bucket completo: `since` y `until` se llevan al inicio de su bucket
+    y el bucket que contiene `until` cuenta entero. Una fecha inválida lanza ValueError.
+    """
+    if granularity not in ("day", "hour"):
+        raise ValueError("granularity debe ser 'day' o 'hour'")
+    variables = {"$granularity": granularity}
+    declared = ["$granularity: string"]
+    if since is not None:
+        variables["$since"] = bucket_start(str(since), granularity)
+        declared.append("$since: string")
+    if until is not None:
+        variables["$until"] = bucket_start(str(until), granularity)
+        declared.append("$until: string")
+
+    if since is not None and until is not None:
+        root = "between(bucket_start, $since, $until)"
+    elif since is not None:
+        root = "ge(bucket_start, $since)"
+    elif until is not None:
+        root = "le(bucket_start, $until)"
+    else:
+        return "eq(granularity, $granularity)", "", variables, ", ".join(declared)
+    return root, " @filter(eq(granularity, $granularity))", variables, ", ".join(declared)
+
+
+def _interaction_leaderboard(client, counter, alias, projection, limit, cursor, since, until, granularity):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    keyset, offset = _keyset_clause(state, "c")
+    root, window_filter, variables, declared = _bucket_window(granularity, since, until)
+    txn = client.txn(read_only=True)
     try:
-        query = """
-        {
-            interactions(func: eq(interaction_type, "purchase")) {
-                interaction_type
-                with_product {
-                    uid
-                    name
-                    category
-                    price
-                }
-            }
-        }
+        # Cada bucket propaga su contador a su producto; math suma todos los buckets del producto
+        query = f"""
+        query leaderboard({declared}) {{
+            var(func: {root}){window_filter} {{
+                n as {counter}
+                bucket_product {{
+                    c as math(n)
+                }}
+            }}
+
+            products(func: uid(c), orderdesc: val(c), first: {limit + 1}, offset: {offset}) @filter(gt(val(c), 0){keyset}) {{
+                uid
+                name
+                category
+                price
+                {alias}: val(c)
+            }}
+        }}
         """
-        res = txn.query(query)
-        data = json.loads(res.json)
-
-        product_counts = {}
-        for inter in data.get("interactions", []):
-            for p in inter.get("with_product", []):
-                uid = p["uid"]
-                if uid not in product_counts:
-                    product_counts[uid] = {
-                        "uid": uid,
-                        "name": p["name"],
-                        "category": p.get("category"),
-                        "price": p.get("price"),
-                        "purchases": 0
-                    }
-                product_counts[uid]["purchases"] += 1
-
-        most_purchased = sorted(product_counts.values(), key=lambda x: x["purchases"], reverse=True)
-        return most_purchased
+        res = txn.query(query, variables=variables)
+        return keyset_page(decode_records(res.json, projection), limit, alias, state)
     finally:
         txn.discard()
 
 
+# 7. Más comprados
+def get_most_purchased_products(client, limit=None, cursor=None, since=None, until=None, granularity="day"):
+    return _interaction_leaderboard(client, "bucket_purchases", "purchases", MOST_PURCHASED,
+                                    limit, cursor, since, until, granularity)
+
+
 # 8. Más vistos
-def get_most_viewed_products(client):
-    txn = client.txn()
+def get_most_viewed_products(client, limit=None, cursor=None, since=None, until=None, granularity="day"):
+    return _interaction_leaderboard(client, "bucket_views", "views", MOST_VIEWED,
+                                    limit, cursor, since, until, granularity)
+
+ 
+
+# 9. Recomendación por usuarios similares
+def get_similar_users(client, user_email, limit=None, cursor=None,
+                      min_price=None, max_price=None, categories=None, exclude=None):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    keyset, offset = _keyset_clause(state, "score")
+    params = _QueryVariables()
+    params.add("email", "string", user_email)
+    product_filter = _and("NOT uid(bought)", *_product_filter(params, min_price, max_price, categories, exclude))
+    txn = client.txn(read_only=True)
     try:
-        query = """
-        {
-            interactions(func: eq(interaction_type, "view")) {
-                interaction_type
-                with_product {
-                    uid
-                    name
-                    category
-                    price
-                }
-            }
-        }
+        # Productos que compraron otros usuarios, sin lo ya comprado
+        q = f"""
+        query similar({params.declaration()}) {{{_purchases_block(me=True)}
+{_similar_blocks("products", product_filter, limit + 1, offset, keyset)}
+        }}
         """
-        res = txn.query(query)
-        data = json.loads(res.json)
-
-        product_counts = {}
-        for inter in data.get("interactions", []):
-            for p in inter.get("with_product", []):
-                uid = p["uid"]
-                if uid not in product_counts:
-                    product_counts[uid] = {
-                        "uid": uid,
-                        "name": p["name"],
-                        "category": p.get("category"),
-                        "price": p.get("price"),
-                        "views": 0
-                    }
-                product_counts[uid]["views"] += 1
-
-        most_viewed = sorted(product_counts.values(), key=lambda x: x["views"], reverse=True)
-        return most_viewed
+        res = txn.query(q, variables=params.values)
+        return keyset_page(decode_records(res.json, SIMILAR_USERS_PRODUCT), limit, "score", state)
     finally:
         txn.discard()
 
- 
 
-# 9. Recomendación por usuarios similares
-def get_similar_users(client, user_email):
-    txn = client.txn()
+
+# 10. Recomendación por productos top rated
+def get_top_rated_products(client, limit=None, cursor=None):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    keyset, offset = _keyset_clause(state, "rating_avg")
+    txn = client.txn(read_only=True)
     try:
-        # Query para obtener productos del usuario y de todos los demás
-        q = f"""
+        query = f"""
         {{
-          user(func: eq(email, "{user_email}")) {{
-            name
-            ~has_cart {{
-              contains {{
+            var(func: has(category)) {{
+                ~of_product {{
+                    r as rating
+                }}
+                rating_avg as avg(val(r))
+                review_count as count(~of_product)
+            }}
+
+            products(func: uid(rating_avg), orderdesc: val(rating_avg), first: {limit + 1}, offset: {offset}) @filter(gt(val(review_count), 0){keyset}) {{
+                uid
                 name
                 category
                 price
-              }}
+                avg_rating: val(rating_avg)
+                num_reviews: val(review_count)
             }}
-          }}
+        }}
+        """
+        res = txn.query(query)
+        return keyset_page(decode_records(res.json, TOP_RATED), limit, "avg_rating", state)
+    finally:
+        txn.discard()
 
-          similar(func: has(email)) {{
-            name
-            email
-            ~has_cart {{
-              contains {{
+
+# 11. Recomendación por tendencia
+def get_trending_products(client, limit=None, cursor=None, since=None, until=None, granularity="day"):
+    limit = clamp_limit(limit)
+    state = decode_cursor(cursor)
+    keyset, offset = _keyset_clause(state, "t")
+    root, window_filter, variables, declared = _bucket_window(granularity, since, until)
+    txn = client.txn(read_only=True)
+    try:
+        query = f"""
+        query trending({declared}) {{
+            var(func: {root}){window_filter} {{
+                bv as bucket_views
+                bc as bucket_clicks
+                bp as bucket_purchases
+                bt as math(bv + bc + bp)
+                bucket_product {{
+                    v as math(bv)
+                    cl as math(bc)
+                    pu as math(bp)
+                    t as math(bt)
+                }}
+            }}
+
+            products(func: uid(t), orderdesc: val(t), first: {limit + 1}, offset: {offset}) @filter(gt(val(t), 0){keyset}) {{
+                uid
                 name
                 category
                 price
-              }}
+                views: val(v)
+                clicks: val(cl)
+                purchases: val(pu)
+                total: val(t)
             }}
-          }}
         }}
         """
-        res = txn.query(q)
-        data = json.loads(res.json)
-
-        # Productos del usuario base
-        user_data = data.get("user", [])
-        purchased = set()
-        for u in user_data:
-            for cart in u.get("~has_cart", []):
-                for prod in cart.get("contains", []):
-                    purchased.add(prod["name"])
-
-        # Recomendaciones basadas en usuarios similares
-        recommendations = {}
-        for su in data.get("similar", []):
-            if su.get("email") == user_email:
-                continue  # saltar el mismo usuario
-            for cart in su.get("~has_cart", []):
-                for prod in cart.get("contains", []):
-                    if prod["name"] not in purchased:
-                        uid = prod["name"]
-                        if uid not in recommendations:
-                            recommendations[uid] = {
-                                "name": prod["name"],
-                                "category": prod.get("category"),
-                                "price": prod.get("price"),
-                                "score": 0
-                            }
-                        recommendations[uid]["score"] += 1
-
-        return sorted(recommendations.values(), key=lambda x: x["score"], reverse=True)
+        res = txn.query(query, variables=variables)
+        return keyset_page(decode_records(res.json, TRENDING), limit, "total", state)
     finally:
         txn.discard()
 
 
+# 13. Búsqueda de reseñas (fulltext sobre comment)
+REVIEW_TEXT_MODES = {"any": "anyoftext", "all": "alloftext"}
+# Orden de search_reviews: el rating tiene pocos valores distintos, así que se desempata
+# por fecha; si no, el offset de empates del cursor crecería con cada página
+REVIEW_ORDER_FIELDS = {"date": ("review_created_at",), "rating": ("rating", "review_created_at")}
+REVIEW_ORDER_TYPES = {"rating": "float", "review_created_at": "string"}
 
-# 10. Recomendación por productos top rated
-def get_top_rated_products(client):
-    txn = client.txn()
-    try:
-        query = """
-        {
-            reviews(func: has(rating)) {
+def search_reviews(client, text=None, mode="any", min_rating=None, max_rating=None,
+                   since=None, until=None, order_by="date", descending=True,
+                   limit=None, cursor=None, count_only=False):
+    """
+    Busca reseñas por texto (anyoftext/alloftext) con filtros opcionales de rating y fecha.
+    Devuelve {"items": [...], "next_cursor": ...} con producto y autor en la misma
+    respuesta, o solo el total si count_only=True.
+    """
+    if mode not in REVIEW_TEXT_MODES:
+        raise ValueError(f"mode debe ser uno de {sorted(REVIEW_TEXT_MODES)}")
+    if order_by not in REVIEW_ORDER_FIELDS:
+        raise ValueError(f"order_by debe ser uno de {sorted(REVIEW_ORDER_FIELDS)}")
+
+    params = _QueryVariables()
+    if text:
+        root = f"{REVIEW_TEXT_MODES[mode]}(comment, {params.add('text', 'string', text)})"
+    else:
+        root = "has(comment)"
+
+    filters = []
+    if min_rating is not None:
+        filters.append(f"ge(rating, {params.add('min_rating', 'float', float(min_rating))})")
+    if max_rating is not None:
+        filters.append(f"le(rating, {params.add('max_rating', 'float', float(max_rating))})")
+    if since is not None:
+        filters.append(f"ge(review_created_at, {params.add('since', 'string', since)})")
+    if until is not None:
+        filters.append(f"le(review_created_at, {params.add('until', 'string', until)})")
+
+    if count_only:
+        block = "{ count(uid) }"
+        args = ""
+    else:
+        limit = clamp_limit(limit)
+        order_fields = REVIEW_ORDER_FIELDS[order_by]
+        state = decode_cursor(cursor)
+        offset = 0
+        if state:
+            # Keyset sobre (rating, fecha) o fecha: continuar desde la última fila, saltando
+            # con offset solo las filas ya vistas iguales en todos los campos
+            values = state.get("value")
+            if not isinstance(values, list) or len(values) != len(order_fields):
+                raise ValueError("Cursor inválido")
+            names = [params.add(f"cursor_{i}", REVIEW_ORDER_TYPES[field], value)
+                     for i, (field, value) in enumerate(zip(order_fields, values))]
+            strict, inclusive = ("lt", "le") if descending else ("gt", "ge")
+            clause = f"{inclusive}({order_fields[-1]}, {names[-1]})"
+            for field, name in zip(reversed(order_fields[:-1]), reversed(names[:-1])):
+                clause = f"({strict}({field}, {name}) OR (eq({field}, {name}) AND {clause}))"
+            filters.append(clause)
+            offset = state.get("ties", 0)
+        direction = "orderdesc" if descending else "orderasc"
+        args = ("".join(f", {direction}: {field}" for field in order_fields)
+                + f", first: {params.add('page_size', 'int', limit + 1)}"
+                + f", offset: {params.add('skip', 'int', offset)}")
+        block = """{
+                uid
                 rating
+                comment
+                review_created_at
                 of_product {
                     uid
                     name
                     category
                     price
                 }
-            }
-        }
-        """
-        res = txn.query(query)
-        data = json.loads(res.json)
-
-        # Diccionario para acumular ratings por producto
-        product_ratings = {}
-        for r in data.get("reviews", []):
-            rating = r.get("rating")
-            for p in r.get("of_product", []):
-                uid = p["uid"]
-                if uid not in product_ratings:
-                    product_ratings[uid] = {
-                        "uid": uid,
-                        "name": p["name"],
-                        "category": p.get("category"),
-                        "price": p.get("price"),
-                        "ratings": []
-                    }
-                product_ratings[uid]["ratings"].append(rating)
-
-        # Calcular promedio
-        top_products = []
-        for p in product_ratings.values():
-            avg_rating = sum(p["ratings"]) / len(p["ratings"])
-            top_products.append({
-                "uid": p["uid"],
-                "name": p["name"],
-                "category": p["category"],
-                "price": p["price"],
-                "avg_rating": round(avg_rating, 2),
-                "num_reviews": len(p["ratings"])
-            })
-
-        # Ordenar por promedio descendente
-        top_products.sort(key=lambda x: x["avg_rating"], reverse=True)
-
-        return top_products
-    finally:
-        txn.discard()
-
-
-# 11. Recomendación por tendencia
-def get_trending_products(client):
-    txn = client.txn()
-    try:
-        query = """
-        {
-            interactions(func: has(interaction_type)) {
-                interaction_type
-                with_product {
+                reviewed_by {
                     uid
                     name
-                    category
-                    price
+                    email
                 }
-            }
-        }
+            }"""
+
+    filter_clause = f" @filter({' AND '.join(filters)})" if filters else ""
+    header = f"query search({params.declaration()})" if params.declared else ""
+    query = f"""
+        {header} {{
+            reviews(func: {root}{args}){filter_clause} {block}
+        }}
         """
-        res = txn.query(query)
-        data = json.loads(res.json)
-
-        product_counts = {}
-        for inter in data.get("interactions", []):
-            for p in inter.get("with_product", []): 
-                uid = p["uid"]
-                if uid not in product_counts:
-                    product_counts[uid] = {
-                        "uid": uid,
-                        "name": p["name"],
-                        "category": p.get("category"),
-                        "price": p.get("price"),
-                        "views": 0,
-                        "clicks": 0,
-                        "purchases": 0,
-                        "total": 0
-                    }
-                itype = inter.get("interaction_type")
-                if itype == "view":
-                    product_counts[uid]["views"] += 1
-                elif itype == "click":
-                    product_counts[uid]["clicks"] += 1
-                elif itype == "purchase":
-                    product_counts[uid]["purchases"] += 1
-                product_counts[uid]["total"] += 1
-
-        trending = sorted(product_counts.values(), key=lambda x: x["total"], reverse=True)
-        return trending
+
+    txn = client.txn(read_only=True)
+    try:
+        res = txn.query(query, variables=params.values)
+        if count_only:
+            rows = loads(res.json).get("reviews", [])
+            return rows[0].get("count", 0) if rows else 0
+        rows = decode_records(res.json, SEARCHED_REVIEW)
+        return keyset_page(rows, limit, order_fields, state)
     finally:
         txn.discard()
 
 
-    
-
-
+# 14. Panel de usuario: interacciones + recomendaciones en una sola ida y vuelta
+def get_user_dashboard(client, user_email, limit=None,
+                       min_price=None, max_price=None, categories=None, exclude=None):
+    """
+    Resuelve el usuario una vez y devuelve sus interacciones y las recomendaciones por
+    historial y por usuarios similares en una única query multi-bloque. El subárbol
+    ~has_cart { contains } se recorre una sola vez y se comparte con variables
+    (me, bought, categories); los bloques de recomendación son los mismos que los de
+    get_history_recommendations / get_similar_users, con los mismos filtros de producto.
+    Cada lista es una página con el mismo cursor que esas funciones y
+    get_user_interactions, para seguir paginando con ellas.
+    """
+    limit = clamp_limit(limit)
+    params = _QueryVariables()
+    params.add("email", "string", user_email)
+    product_filter = _and("NOT uid(bought)", *_product_filter(params, min_price, max_price, categories, exclude))
+    txn = client.txn(read_only=True)
+    try:
+        query = f"""
+        query dashboard({params.declaration()}) {{{_purchases_block(me=True, categories=True)}
 
-    
+          user(func: uid(me)) {{
+            uid
+            name
+            email
+            ~by_user (first: {limit + 1}) {{
+              uid
+              interaction_type
+              timestamp
+              duration
+              with_product {{
+                uid
+                name
+                category
+                price
+              }}
+            }}
+          }}
+{_history_block("history", product_filter, limit + 1)}
+{_similar_blocks("similar", product_filter, limit + 1)}
+        }}
+        """
+        res = txn.query(query, variables=params.values)
+        data = loads(res.json)
+        users = data.get("user", [])
+        user = {k: users[0].get(k) for k in ("uid", "name", "email")} if users else None
+        return {
+            "user": user,
+            "interactions": uid_page(list(project(data, INTERACTION_FIELDS)), limit),
+            "history": uid_page(list(project(data, DASHBOARD_HISTORY)), limit),
+            "similar": keyset_page(list(project(data, DASHBOARD_SIMILAR)), limit, "score", None),
+        }
+    finally:
+        txn.discard()
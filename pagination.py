@@ -0,0 +1,104 @@
+import base64
+import json
+
+from decode import loads
+
+# Tamaño de página por defecto y máximo: ninguna query trae listas sin límite
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+def clamp_limit(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def encode_cursor(state):
+    """Convierte el estado de paginación en un cursor opaco (base64 url-safe)."""
+    if state is None:
+        return None
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Estado de paginación de un cursor; None si no hay cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except ValueError:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    if not isinstance(state, dict):
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    # ties acaba como offset en DQL: entero no negativo (bool es int en Python)
+    ties = state.get("ties", 0)
+    if isinstance(ties, bool) or not isinstance(ties, int) or ties < 0:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    return state
+
+
+def uid_page(rows, limit):
+    """
+    Página ordenada por uid (DQL first/after). Se piden limit + 1 filas para saber
+    si hay más; el cursor guarda el último uid devuelto.
+    """
+    items = rows[:limit]
+    next_state = {"after": items[-1]["uid"]} if len(rows) > limit else None
+    return {"items": items, "next_cursor": encode_cursor(next_state)}
+
+
+def keyset_page(rows, limit, key, state):
+    """
+    Página ordenada por valor (orderasc/orderdesc). El cursor guarda el último valor y
+    cuántas filas con ese mismo valor ya se devolvieron, así la siguiente página filtra
+    por le/ge(valor) y solo salta los empates con offset, sin recorrer páginas previas.
+    `key` puede ser una tupla de campos (orden compuesto): el valor es entonces la lista
+    de valores y solo cuentan como empate las filas iguales en todos ellos.
+    """
+    def value_of(row):
+        return [row[k] for k in key] if isinstance(key, tuple) else row[key]
+
+    items = rows[:limit]
+    if len(rows) <= limit:
+        return {"items": items, "next_cursor": None}
+    last = value_of(items[-1])
+    ties = sum(1 for row in items if value_of(row) == last)
+    if state and state.get("value") == last:
+        ties += state.get("ties", 0)
+    return {"items": items, "next_cursor": encode_cursor({"value": last, "ties": ties})}
+
+
+def uid_literal(uid):
+    """Valida un uid antes de interpolarlo en DQL (0x...)."""
+    if not isinstance(uid, str) or not uid.startswith("0x"):
+        raise ValueError(f"uid inválido: {uid!r}")
+    int(uid, 16)
+    return uid
+
+
+# Recorre todos los nodos de `root` por páginas first/after (exportaciones y backfills)
+def iter_node_pages(client, root, body, page_size=1000):
+    after = None
+    while True:
+        after_clause = f", after: {uid_literal(after)}" if after else ""
+        query = f"""
+        {{
+            rows(func: {root}, first: {page_size}{after_clause}) {{
+                uid
+                {body}
+            }}
+        }}
+        """
+        txn = client.txn(read_only=True)
+        try:
+            raw = txn.query(query).json
+        finally:
+            txn.discard()
+        yield raw
+        rows = loads(raw).get("rows", [])
+        if len(rows) < page_size:
+            return
+        after = rows[-1]["uid"]
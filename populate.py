@@ -1,6 +1,8 @@
 import csv
 import pydgraph
 
+from rollup import aggregate, apply_buckets
+
 # Establish Dgraph client
 client_stub = pydgraph.DgraphClientStub('localhost:9080')
 client = pydgraph.DgraphClient(client_stub)
@@ -82,7 +84,7 @@ def load_reviews(client, file_path, user_uid_map, product_uid_map):
         txn.discard()
     return resp.uids
     
-def load_interactions(client, file_path, user_uid_map, product_uid_map):
+def load_interactions(client, file_path, user_uid_map, product_uid_map, sketches=None):
     txn = client.txn()
     try:
         interactions = []
@@ -102,9 +104,18 @@ def load_interactions(client, file_path, user_uid_map, product_uid_map):
                 interactions.append(interaction)
         print(f"Loading interactions: {interactions}")
         resp = txn.mutate(set_obj=interactions)
+        # Los buckets de rollup se actualizan en la misma transacción que los eventos
+        apply_buckets(txn, aggregate(
+            (i['with_product']['uid'], i['interaction_type'], i['timestamp'], i['duration'])
+            for i in interactions
+        ))
         txn.commit()
     finally:
         txn.discard()
+    # Sketches aproximados (opcional): solo se alimentan con lo que llegó a commit
+    if sketches is not None:
+        for i in interactions:
+            sketches.add(i['with_product']['uid'], i['by_user']['uid'], i['interaction_type'])
     return resp.uids
 
 
@@ -0,0 +1,359 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pydgraph
+import scipy.sparse as sp
+
+from decode import Projection, decode_records, loads
+from files import atomic_write
+from pagination import iter_node_pages
+
+# Motor offline de recomendaciones: Personalized PageRank (random walk with restart)
+# sobre el grafo bipartito usuario–producto. Se calcula por lotes de usuarios en forma
+# matricial dispersa y el top-k se escribe de vuelta como aristas `recommended` con
+# facet `score`, o en un archivo de servicio.
+
+# Peso de cada tipo de arista usuario–producto
+INTERACTION_WEIGHTS = {"view": 1.0, "click": 2.0, "purchase": 5.0}
+CART_WEIGHT = 4.0
+REVIEW_WEIGHT = 3.0          # se multiplica por rating / 5
+
+EXPORT_PAGE_SIZE = 1000
+
+INTERACTION_EDGES = Projection("rows", [], {
+    "uid": "uid",
+    "interaction_type": "interaction_type",
+    "user": ("by_user", "uid"),
+    "product": ("with_product", "uid"),
+}, name="InteractionEdge")
+
+REVIEW_EDGES = Projection("rows", [], {
+    "uid": "uid",
+    "rating": "rating",
+    "user": ("reviewed_by", "uid"),
+    "product": ("of_product", "uid"),
+}, name="ReviewEdge")
+
+
+# Exportación del grafo
+def export_edges(client, page_size=EXPORT_PAGE_SIZE):
+    """
+    Exporta las aristas ponderadas usuario–producto: carritos, interacciones según tipo
+    y reseñas según rating. Devuelve (users, products, weights) con uids como enteros.
+    """
+    users, products, weights = [], [], []
+
+    def add(user, product, weight):
+        if user and product and weight > 0:
+            users.append(int(user, 16))
+            products.append(int(product, 16))
+            weights.append(weight)
+
+    for raw in iter_node_pages(client, "has(contains)", "has_cart { uid } contains { uid }", page_size):
+        for cart in loads(raw).get("rows", []):
+            for owner in cart.get("has_cart", []):
+                for product in cart.get("contains", []):
+                    add(owner["uid"], product["uid"], CART_WEIGHT)
+
+    for raw in iter_node_pages(client, "has(interaction_type)",
+                             "interaction_type by_user { uid } with_product { uid }", page_size):
+        for e in decode_records(raw, INTERACTION_EDGES):
+            add(e.user, e.product, INTERACTION_WEIGHTS.get(e.interaction_type, 0.0))
+
+    for raw in iter_node_pages(client, "has(rating)", "rating reviewed_by { uid } of_product { uid }", page_size):
+        for e in decode_records(raw, REVIEW_EDGES):
+            add(e.user, e.product, REVIEW_WEIGHT * (e.rating or 0.0) / 5.0)
+
+    return (np.array(users, dtype=np.uint64), np.array(products, dtype=np.uint64),
+            np.array(weights, dtype=np.float64))
+
+
+# Grafo bipartito
+class BipartiteGraph:
+    """Matriz dispersa usuarios × productos con los índices de uid de cada lado."""
+
+    def __init__(self, users, products, weights):
+        self.user_ids, user_idx = np.unique(users, return_inverse=True)
+        self.product_ids, product_idx = np.unique(products, return_inverse=True)
+        shape = (len(self.user_ids), len(self.product_ids))
+        # coo -> csr suma las aristas repetidas (ej. varias vistas del mismo producto)
+        self.W = sp.coo_matrix((weights, (user_idx, product_idx)), shape=shape).tocsr()
+        self.W.sum_duplicates()
+
+        # Transiciones normalizadas por fila en cada sentido, guardadas ya transpuestas
+        # para propagar la masa como matriz × estado: product_from_user[p, u] = P(u -> p)
+        self.product_from_user = _row_normalize(self.W).T.tocsr()
+        self.user_from_product = _row_normalize(self.W.T.tocsr()).T.tocsr()
+
+    @property
+    def n_users(self):
+        return self.W.shape[0]
+
+    def user_index(self, uids):
+        """Índices de fila de una lista de uids (hex); -1 si el usuario no está en el grafo."""
+        ids = np.array([int(u, 16) for u in uids], dtype=np.uint64)
+        pos = np.searchsorted(self.user_ids, ids)
+        pos = np.minimum(pos, len(self.user_ids) - 1)
+        return np.where(self.user_ids[pos] == ids, pos, -1)
+
+
+def _row_normalize(matrix):
+    sums = np.asarray(matrix.sum(axis=1)).ravel()
+    inv = np.divide(1.0, sums, out=np.zeros_like(sums), where=sums > 0)
+    return (sp.diags(inv) @ matrix).tocsr().astype(np.float32)
+
+
+# Personalized PageRank
+def personalized_pagerank(graph, user_rows, alpha=0.15, iterations=10, tol=1e-3):
+    """
+    Random walk with restart desde cada usuario de `user_rows`, todos a la vez.
+    Devuelve la matriz densa (len(user_rows) × n_products) de probabilidad de visita.
+
+    Cada paso: ru = α·e + (1-α)·rp·P_pu   y   rp = (1-α)·ru·P_up
+    donde e es el usuario de origen y P_up / P_pu las transiciones normalizadas.
+    Para el top-k bastan pocas iteraciones (bench_ppr.py mide la coincidencia con la
+    solución convergida); `tol` corta antes si el cambio L1 por usuario es menor.
+    """
+    batch = len(user_rows)
+    # El estado se guarda como (nodos × lote): cada paso es un producto CSR × denso
+    # sin transponer, que es el caso rápido de scipy
+    restart = np.zeros((graph.n_users, batch), dtype=np.float32)
+    restart[user_rows, np.arange(batch)] = 1.0
+
+    ru = restart
+    rp = (1 - alpha) * (graph.product_from_user @ ru)
+    for _ in range(iterations):
+        new_ru = alpha * restart + (1 - alpha) * (graph.user_from_product @ rp)
+        new_rp = (1 - alpha) * (graph.product_from_user @ new_ru)
+        delta = np.abs(new_rp - rp).sum()
+        ru, rp = new_ru, new_rp
+        if delta < tol * batch:
+            break
+    return np.ascontiguousarray(rp.T)
+
+
+def top_k(graph, user_rows, scores, k, exclude_seen=True):
+    """Top-k productos por usuario: lista de [(product_uid, score), ...] por fila."""
+    if exclude_seen:
+        seen = graph.W[user_rows]
+        scores = scores.copy()
+        scores[seen.nonzero()] = -np.inf
+    k = min(k, scores.shape[1])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    results = []
+    for row, cols in enumerate(best):
+        cols = cols[np.argsort(-scores[row, cols])]
+        results.append([(hex(int(graph.product_ids[c])), float(scores[row, c]))
+                        for c in cols if np.isfinite(scores[row, c]) and scores[row, c] > 0])
+    return results
+
+
+def recommend(graph, user_rows=None, k=10, batch_size=256, alpha=0.15, iterations=10):
+    """Recomendaciones PPR para `user_rows` (todos si es None), procesando por lotes."""
+    if user_rows is None:
+        user_rows = np.arange(graph.n_users)
+    user_rows = np.asarray(user_rows)
+    results = {}
+    for start in range(0, len(user_rows), batch_size):
+        rows = user_rows[start:start + batch_size]
+        scores = personalized_pagerank(graph, rows, alpha, iterations)
+        for row, recs in zip(rows, top_k(graph, rows, scores, k)):
+            results[hex(int(graph.user_ids[row]))] = recs
+    return results
+
+
+# Detección de cambios para el modo incremental
+def graph_edges(graph):
+    """Aristas agregadas del grafo como (users, products, weights), igual que export_edges."""
+    coo = graph.W.tocoo()
+    return graph.user_ids[coo.row], graph.product_ids[coo.col], coo.data
+
+
+def edge_changes(previous, graph):
+    """
+    Compara las aristas `previous` con las de `graph`. Devuelve, sobre los índices de
+    `graph`: los usuarios con alguna arista nueva, borrada o con otro peso, y el cambio
+    L1 de la fila de transiciones normalizadas de cada usuario y de cada producto. Una
+    arista nueva en un nodo con muchas aristas apenas mueve su fila; en uno con pocas,
+    la cambia entera.
+    """
+    old_users, old_products, old_weights = previous
+    new_users, new_products, new_weights = graph_edges(graph)
+    user_ids = np.union1d(old_users, new_users)
+    product_ids = np.union1d(old_products, new_products)
+    shape = (len(user_ids), len(product_ids))
+
+    def matrix(users, products, weights):
+        rows = np.searchsorted(user_ids, users)
+        cols = np.searchsorted(product_ids, products)
+        return sp.csr_matrix((weights, (rows, cols)), shape=shape)
+
+    old, new = matrix(old_users, old_products, old_weights), matrix(new_users, new_products, new_weights)
+    touched = abs(new - old).sum(axis=1).A1 > 0
+    users = abs(_row_normalize(new) - _row_normalize(old)).sum(axis=1).A1
+    products = abs(_row_normalize(new.T.tocsr()) - _row_normalize(old.T.tocsr())).sum(axis=1).A1
+    # Los nodos que ya no están en el grafo no tienen masa en él
+    user_rows = np.searchsorted(user_ids, graph.user_ids)
+    product_rows = np.searchsorted(product_ids, graph.product_ids)
+    return np.flatnonzero(touched[user_rows]), users[user_rows], products[product_rows]
+
+
+def affected_users(previous, graph, alpha=0.15, tol=0.05):
+    """
+    Usuarios (uids hex) cuyo vector PPR puede cambiar más de `tol` (norma L1) entre las
+    aristas `previous` y `graph`, más los que tienen aristas propias cambiadas (aunque su
+    PPR apenas se mueva, cambia qué productos ya vieron).
+
+    Si la fila de transiciones de cada nodo s cambia d(s) en L1, el PPR de un usuario en
+    el grafo nuevo cumple ||π'_u - π_u||₁ ≤ (1-α)/α · Σ_s π'_u(s)·d(s): un usuario cuyo
+    paseo casi no pasa por los nodos cambiados apenas cambia. Esa suma se estima para
+    todos los usuarios a la vez con un push local inverso (Andersen et al., "Local
+    computation of PageRank contributions") desde los nodos cambiados, que solo toca la
+    zona del grafo con masa apreciable y la subestima como mucho r_max; se recalculan
+    los usuarios con estimación por encima de θ - r_max, θ = tol·α/(1-α).
+    """
+    theta = tol * alpha / (1 - alpha)
+    r_max = theta / 2
+    # Transiciones hacia delante: p_from_u[u, p] = P(u -> p), u_from_p[p, u] = P(p -> u)
+    p_from_u = graph.product_from_user.T.tocsr()
+    u_from_p = graph.user_from_product.T.tocsr()
+
+    touched, residual_users, residual_products = edge_changes(previous, graph)
+    estimate_users = np.zeros(graph.n_users)
+    # Push por barridos: todos los nodos con residuo > r_max empujan a la vez a sus
+    # predecesores; la masa residual total cae al menos un factor (1-α) por barrido
+    while True:
+        push_users = np.where(residual_users > r_max, residual_users, 0.0)
+        push_products = np.where(residual_products > r_max, residual_products, 0.0)
+        if not push_users.any() and not push_products.any():
+            break
+        estimate_users += alpha * push_users
+        residual_users = residual_users - push_users + (1 - alpha) * (p_from_u @ push_products)
+        residual_products = residual_products - push_products + (1 - alpha) * (u_from_p @ push_users)
+
+    rows = np.union1d(touched, np.flatnonzero(estimate_users + r_max > theta))
+    return [hex(int(u)) for u in graph.user_ids[rows]]
+
+
+def _load_edges(path):
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return data["users"], data["products"], data["weights"]
+
+
+def _save_edges(path, graph):
+    """Guarda las aristas del grafo para el próximo incremental."""
+    users, products, weights = graph_edges(graph)
+    with atomic_write(path, "wb") as f:
+        np.savez_compressed(f, users=users, products=products, weights=weights)
+
+
+def _load_json(path, default):
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return default
+
+
+# Salida
+def write_serving_file(path, results):
+    with atomic_write(path) as f:
+        json.dump({user: [[p, s] for p, s in recs] for user, recs in results.items()}, f)
+
+
+def write_recommendations(client, results, batch_size=500):
+    """Reemplaza las aristas `recommended` de cada usuario por su top-k con facet score."""
+    items = list(results.items())
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        txn = client.txn()
+        try:
+            txn.mutate(del_obj=[{"uid": user, "recommended": None} for user, _ in chunk])
+            txn.mutate(set_obj=[{
+                "uid": user,
+                "recommended": [{"uid": p, "recommended|score": s} for p, s in recs],
+            } for user, recs in chunk if recs])
+            txn.commit()
+        finally:
+            txn.discard()
+
+
+def run_full(client, k=10, batch_size=256, alpha=0.15, output=None, write_back=False, state=None,
+             iterations=10):
+    graph = BipartiteGraph(*export_edges(client))
+    start = time.perf_counter()
+    results = recommend(graph, k=k, batch_size=batch_size, alpha=alpha, iterations=iterations)
+    elapsed = time.perf_counter() - start
+    if output:
+        write_serving_file(output, results)
+    if write_back:
+        write_recommendations(client, results)
+    if state:
+        _save_edges(state, graph)
+    return results, elapsed
+
+
+def run_incremental(client, state, k=10, batch_size=256, alpha=0.15, output=None, write_back=False,
+                    iterations=10, tol=0.05):
+    """
+    Recalcula solo los usuarios cuyo PPR puede haber cambiado más de `tol` (L1) desde la
+    última ejecución (ver affected_users; sin estado previo, todos) y los mezcla con la
+    salida previa. Los demás conservan su recomendación anterior: el error se acumula
+    entre ejecuciones incrementales, así que conviene un `full` periódico.
+    """
+    graph = BipartiteGraph(*export_edges(client))
+    previous = _load_edges(state)
+    if previous is None:
+        changed = [hex(int(u)) for u in graph.user_ids]
+    else:
+        changed = affected_users(previous, graph, alpha, tol)
+
+    start = time.perf_counter()
+    rows = graph.user_index(changed) if changed else np.array([], dtype=np.int64)
+    results = (recommend(graph, rows, k=k, batch_size=batch_size, alpha=alpha, iterations=iterations)
+               if len(rows) else {})
+    elapsed = time.perf_counter() - start
+
+    if output:
+        current = {hex(int(u)) for u in graph.user_ids}
+        merged = {u: recs for u, recs in _load_json(output, {}).items() if u in current}
+        merged.update(results)
+        write_serving_file(output, merged)
+    if write_back and results:
+        write_recommendations(client, results)
+    _save_edges(state, graph)
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recomendaciones Personalized PageRank")
+    parser.add_argument("mode", choices=["full", "incremental"])
+    parser.add_argument("--host", default="localhost:9080")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--alpha", type=float, default=0.15, help="probabilidad de reinicio")
+    parser.add_argument("--output", default="ppr_recommendations.json")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--tol", type=float, default=0.05,
+                        help="cambio L1 máximo tolerado en el PPR de un usuario no recalculado (incremental)")
+    parser.add_argument("--state", default="ppr_state.npz")
+    parser.add_argument("--write-back", action="store_true", help="escribir aristas recommended en Dgraph")
+    args = parser.parse_args()
+
+    client = pydgraph.DgraphClient(pydgraph.DgraphClientStub(args.host))
+    if args.mode == "full":
+        results, elapsed = run_full(client, args.top_k, args.batch_size, args.alpha,
+                                    args.output, args.write_back, args.state, args.iterations)
+    else:
+        results, elapsed = run_incremental(client, args.state, args.top_k, args.batch_size,
+                                           args.alpha, args.output, args.write_back, args.iterations, args.tol)
+    rate = len(results) / elapsed if elapsed else 0.0
+    print(f"✔ {len(results)} usuarios recalculados en {elapsed:.2f}s ({rate:.0f} usuarios/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import datetime
+import json
+
+import pydgraph
+
+from decode import Projection, decode_records, loads
+from pagination import iter_node_pages
+from transactions import commit_with_retries
+
+# Rollup de interacciones: un nodo InteractionBucket por producto y día (u hora) con los
+# conteos de view/click/purchase y la duración total. Los rankings leen solo los buckets
+# de la ventana pedida en lugar de recorrer cada evento.
+
+GRANULARITIES = ("day", "hour")
+COUNTERS = {"view": "bucket_views", "click": "bucket_clicks", "purchase": "bucket_purchases"}
+
+LOOKUP_CHUNK = 500
+
+INTERACTION_ROWS = Projection("rows", [], {
+    "interaction_type": "interaction_type",
+    "timestamp": "timestamp",
+    "duration": "duration",
+    "product": ("with_product", "uid"),
+}, name="InteractionRow")
+
+
+def bucket_start(timestamp, granularity):
+    """Inicio del bucket (ISO, UTC) que contiene `timestamp`."""
+    ts = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    if granularity == "day":
+        ts = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif granularity == "hour":
+        ts = ts.replace(minute=0, second=0, microsecond=0)
+    else:
+        raise ValueError(f"granularity debe ser uno de {GRANULARITIES}")
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def aggregate(rows, granularities=GRANULARITIES):
+    """
+    Agrupa interacciones (product_uid, interaction_type, timestamp, duration) en
+    contadores por bucket. Devuelve dict bucket_key -> bucket.
+    """
+    buckets = {}
+    for product, interaction_type, timestamp, duration in rows:
+        if not product or not timestamp:
+            continue
+        for granularity in granularities:
+            start = bucket_start(timestamp, granularity)
+            key = f"{product}|{granularity}|{start}"
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    "product": product,
+                    "granularity": granularity,
+                    "start": start,
+                    "bucket_views": 0,
+                    "bucket_clicks": 0,
+                    "bucket_purchases": 0,
+                    "bucket_duration": 0.0,
+                }
+            counter = COUNTERS.get(interaction_type)
+            if counter:
+                bucket[counter] += 1
+            bucket["bucket_duration"] += float(duration or 0.0)
+    return buckets
+
+
+def apply_buckets(txn, buckets, replace=False):
+    """
+    Suma `buckets` a los nodos existentes dentro de `txn` (sin commit), creando los que
+    falten. Con replace=True sobrescribe los valores en lugar de sumarlos.
+    bucket_key tiene @upsert, así dos cargas concurrentes sobre el mismo bucket chocan y
+    una de ellas aborta en vez de perder un incremento.
+    """
+    keys = list(buckets)
+    existing = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start:start + LOOKUP_CHUNK]
+        query = f"""
+        {{
+            buckets(func: eq(bucket_key, {json.dumps(chunk)})) {{
+                uid
+                bucket_key
+                bucket_views
+                bucket_clicks
+                bucket_purchases
+                bucket_duration
+            }}
+        }}
+        """
+        for node in loads(txn.query(query).json).get("buckets", []):
+            existing[node["bucket_key"]] = node
+
+    objs = []
+    for i, (key, bucket) in enumerate(buckets.items()):
+        node = existing.get(key)
+        obj = {"uid": node["uid"] if node else f"_:bucket_{i}"}
+        for counter in ("bucket_views", "bucket_clicks", "bucket_purchases", "bucket_duration"):
+            previous = 0 if replace or node is None else node.get(counter, 0)
+            obj[counter] = previous + bucket[counter]
+        if node is None:
+            obj.update({
+                # dgraph.type hace falta para que el borrado {"uid": ...} de buckets
+                # huérfanos en backfill sepa qué predicados eliminar
+                "dgraph.type": "InteractionBucket",
+                "bucket_key": key,
+                "granularity": bucket["granularity"],
+                "bucket_start": bucket["start"],
+                "bucket_product": {"uid": bucket["product"]},
+            })
+        objs.append(obj)
+    if objs:
+        txn.mutate(set_obj=objs)
+    return len(objs)
+
+
+def update_buckets(client, rows, granularities=GRANULARITIES, set_obj=None):
+    """
+    Actualiza los buckets de nuevas interacciones (y guarda `set_obj`, ej. los propios
+    eventos, en la misma transacción) con reintentos. Devuelve (nº de buckets, nº de aborts).
+    """
+    buckets = aggregate(rows, granularities)
+
+    def mutate(txn):
+        if set_obj is not None:
+            txn.mutate(set_obj=set_obj)
+        return apply_buckets(txn, buckets)
+
+    return commit_with_retries(client, mutate)
+
+
+def backfill(client, granularities=GRANULARITIES, page_size=1000, batch_size=2000):
+    """
+    Reconstruye los buckets desde todo el historial de interacciones: sobrescribe los
+    valores de cada bucket y borra los que ya no corresponden a ningún evento. Conviene
+    ejecutarlo con la carga de interacciones detenida.
+    """
+    rows = []
+    for raw in iter_node_pages(client, "has(interaction_type)",
+                               "interaction_type timestamp duration with_product { uid }", page_size):
+        rows.extend((r.product, r.interaction_type, r.timestamp, r.duration)
+                    for r in decode_records(raw, INTERACTION_ROWS))
+    buckets = aggregate(rows, granularities)
+
+    # Se sobrescribe en el sitio: los rankings nunca ven la ventana sin buckets
+    items = list(buckets.items())
+    for start in range(0, len(items), batch_size):
+        txn = client.txn()
+        try:
+            apply_buckets(txn, dict(items[start:start + batch_size]), replace=True)
+            txn.commit()
+        finally:
+            txn.discard()
+
+    stale = []
+    for granularity in granularities:
+        for raw in iter_node_pages(client, f'eq(granularity, "{granularity}")', "bucket_key", page_size):
+            stale.extend({"uid": node["uid"]} for node in loads(raw).get("rows", [])
+                         if node.get("bucket_key") not in buckets)
+    for start in range(0, len(stale), batch_size):
+        txn = client.txn()
+        try:
+            txn.mutate(del_obj=stale[start:start + batch_size])
+            txn.commit()
+        finally:
+            txn.discard()
+    return len(rows), len(buckets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollup de interacciones por producto y día/hora")
+    parser.add_argument("--host", default="localhost:9080")
+    parser.add_argument("--granularity", choices=GRANULARITIES, action="append",
+                        help="por defecto day y hour")
+    args = parser.parse_args()
+
+    client = pydgraph.DgraphClient(pydgraph.DgraphClientStub(args.host))
+    events, buckets = backfill(client, tuple(args.granularity or GRANULARITIES))
+    print(f"✔ {events} interacciones agregadas en {buckets} buckets.")
+
+
+if __name__ == "__main__":
+    main()
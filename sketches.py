@@ -0,0 +1,291 @@
+import array
+import base64
+import hashlib
+import json
+import math
+import zlib
+
+from files import atomic_write
+
+# Sketches aproximados para el flujo de interacciones: popularidad (count-min + top-k) y
+# usuarios únicos (HyperLogLog). Ocupan memoria fija, se pueden fusionar entre workers
+# de carga en paralelo y se guardan en disco como JSON.
+
+
+def _hash128(key):
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+def _hash64(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _encode(buffer):
+    # Los registros de productos poco visitados son casi todo ceros: zlib los reduce mucho
+    return base64.b64encode(zlib.compress(bytes(buffer))).decode("ascii")
+
+
+def _decode(text):
+    return zlib.decompress(base64.b64decode(text.encode("ascii")))
+
+
+# Count-min sketch
+class CountMinSketch:
+    """
+    Frecuencias aproximadas: estimate(x) nunca subestima y, con probabilidad 1 - δ,
+    sobreestima como mucho ε·N, con ε = e / width y δ = e^-depth (N = total añadido).
+    """
+
+    def __init__(self, width=2048, depth=5):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [array.array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def _columns(self, key):
+        # Doble hashing (Kirsch–Mitzenmacher): depth índices a partir de un hash de 128 bits
+        h1, h2 = _hash128(key)
+        h2 |= 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Suma `count` a `key` y devuelve la nueva estimación."""
+        self.total += count
+        estimate = None
+        for row, col in zip(self.rows, self._columns(key)):
+            row[col] += count
+            estimate = row[col] if estimate is None else min(estimate, row[col])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[col] for row, col in zip(self.rows, self._columns(key)))
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    def error_bound(self):
+        """Sobreestimación máxima esperada (ε·N) con probabilidad 1 - δ."""
+        return self.epsilon * self.total
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Solo se pueden fusionar count-min sketches de igual tamaño")
+        self.total += other.total
+        for mine, theirs in zip(self.rows, other.rows):
+            for i, value in enumerate(theirs):
+                if value:
+                    mine[i] += value
+        return self
+
+    def to_dict(self):
+        return {"width": self.width, "depth": self.depth, "total": self.total,
+                "rows": [_encode(row.tobytes()) for row in self.rows]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["width"], data["depth"])
+        sketch.total = data["total"]
+        sketch.rows = [array.array("q", _decode(row)) for row in data["rows"]]
+        return sketch
+
+
+# Heavy hitters
+class TopK:
+    """
+    Top-k aproximado: un count-min da las estimaciones y se mantienen como candidatos
+    los `capacity` elementos con mayor estimación (capacity > k da margen a la cola).
+    """
+
+    def __init__(self, k=10, capacity=None, width=2048, depth=5):
+        self.k = k
+        self.capacity = capacity or 10 * k
+        self.cms = CountMinSketch(width, depth)
+        self.candidates = {}
+        self._min_key = None
+
+    def _refresh_min(self):
+        self._min_key = min(self.candidates, key=self.candidates.get) if self.candidates else None
+
+    def add(self, key, count=1):
+        estimate = self.cms.add(key, count)
+        if key in self.candidates:
+            self.candidates[key] = estimate
+            if key == self._min_key:
+                self._refresh_min()
+        elif len(self.candidates) < self.capacity:
+            self.candidates[key] = estimate
+            if self._min_key is None or estimate < self.candidates[self._min_key]:
+                self._min_key = key
+        elif estimate > self.candidates[self._min_key]:
+            del self.candidates[self._min_key]
+            self.candidates[key] = estimate
+            self._refresh_min()
+
+    def top(self, k=None):
+        """[(clave, estimación), ...] ordenado de mayor a menor."""
+        ranked = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k or self.k]
+
+    def merge(self, other):
+        self.cms.merge(other.cms)
+        keys = set(self.candidates) | set(other.candidates)
+        estimates = {key: self.cms.estimate(key) for key in keys}
+        best = sorted(estimates.items(), key=lambda item: item[1], reverse=True)[:self.capacity]
+        self.candidates = dict(best)
+        self._refresh_min()
+        return self
+
+    def to_dict(self):
+        return {"k": self.k, "capacity": self.capacity, "cms": self.cms.to_dict(),
+                "candidates": self.candidates}
+
+    @classmethod
+    def from_dict(cls, data):
+        top = cls(data["k"], data["capacity"])
+        top.cms = CountMinSketch.from_dict(data["cms"])
+        top.candidates = dict(data["candidates"])
+        top._refresh_min()
+        return top
+
+
+# HyperLogLog
+class HyperLogLog:
+    """Cardinalidad aproximada con 2^p registros; error relativo típico 1.04 / sqrt(2^p)."""
+
+    def __init__(self, p=12):
+        if not 4 <= p <= 16:
+            raise ValueError("p debe estar entre 4 y 16")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, item):
+        h = _hash64(item)
+        index = h & (self.m - 1)
+        w = h >> self.p
+        rank = (64 - self.p) - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Corrección para cardinalidades pequeñas (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def merge(self, other):
+        if self.p != other.p:
+            raise ValueError("Solo se pueden fusionar HyperLogLog de igual precisión")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def to_dict(self):
+        return {"p": self.p, "registers": _encode(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        hll = cls(data["p"])
+        hll.registers = bytearray(_decode(data["registers"]))
+        return hll
+
+
+# Sketches del flujo de interacciones
+class InteractionSketches:
+    """
+    Top-k de productos por tipo de interacción y usuarios únicos por producto para los
+    tipos de `distinct_types` (por defecto view y purchase).
+    """
+
+    def __init__(self, k=10, capacity=None, width=2048, depth=5, hll_p=10,
+                 distinct_types=("view", "purchase")):
+        self.config = {"k": k, "capacity": capacity, "width": width, "depth": depth,
+                       "hll_p": hll_p, "distinct_types": list(distinct_types)}
+        self.popularity = {}
+        self.distinct = {}
+
+    def add(self, product, user, interaction_type):
+        top = self.popularity.get(interaction_type)
+        if top is None:
+            top = self.popularity[interaction_type] = TopK(
+                self.config["k"], self.config["capacity"], self.config["width"], self.config["depth"])
+        top.add(product)
+        if interaction_type in self.config["distinct_types"]:
+            key = f"{interaction_type}|{product}"
+            hll = self.distinct.get(key)
+            if hll is None:
+                hll = self.distinct[key] = HyperLogLog(self.config["hll_p"])
+            hll.add(user)
+
+    def merge(self, other):
+        """Fusiona los sketches de otro worker (mismo tamaño) en este."""
+        for interaction_type, top in other.popularity.items():
+            if interaction_type in self.popularity:
+                self.popularity[interaction_type].merge(top)
+            else:
+                self.popularity[interaction_type] = TopK.from_dict(top.to_dict())
+        for key, hll in other.distinct.items():
+            if key in self.distinct:
+                self.distinct[key].merge(hll)
+            else:
+                self.distinct[key] = HyperLogLog.from_dict(hll.to_dict())
+        return self
+
+    def to_dict(self):
+        return {
+            "config": self.config,
+            "popularity": {t: top.to_dict() for t, top in self.popularity.items()},
+            "distinct": {key: hll.to_dict() for key, hll in self.distinct.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        config = data["config"]
+        sketches = cls(config["k"], config["capacity"], config["width"], config["depth"],
+                       config["hll_p"], config["distinct_types"])
+        sketches.popularity = {t: TopK.from_dict(top) for t, top in data["popularity"].items()}
+        sketches.distinct = {key: HyperLogLog.from_dict(hll) for key, hll in data["distinct"].items()}
+        return sketches
+
+    def save(self, path):
+        with atomic_write(path) as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# Consultas
+def top_k_trending(sketches, interaction_type=None, k=10):
+    """
+    Top-k aproximado de productos para un tipo de interacción, o para todos los tipos
+    sumados si interaction_type es None. Devuelve [(product_uid, estimación), ...].
+    """
+    if interaction_type is not None:
+        top = sketches.popularity.get(interaction_type)
+        return top.top(k) if top else []
+    combined = None
+    for top in sketches.popularity.values():
+        combined = TopK.from_dict(top.to_dict()) if combined is None else combined.merge(top)
+    return combined.top(k) if combined else []
+
+
+def distinct_users(sketches, product, interaction_type="view"):
+    """Número aproximado de usuarios distintos con `interaction_type` sobre `product`."""
+    hll = sketches.distinct.get(f"{interaction_type}|{product}")
+    return hll.count() if hll else 0
@@ -0,0 +1,269 @@
+import argparse
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pydgraph
+
+from decode import loads
+from files import atomic_write
+from model import (
+    get_copurchased_products,
+    get_history_recommendations,
+    get_similar_users,
+    get_top_rated_products,
+    get_trending_products,
+)
+from pagination import iter_node_pages
+
+# Snapshot binario de recomendaciones precalculadas para servir sin consultar Dgraph.
+#
+# Formato (little endian, arrays alineados a 8 bytes):
+#   cabecera   MAGIC, FORMAT_VERSION, nº de secciones, versión del snapshot (ns)
+#   directorio por sección: nombre, nº de claves, nº de valores y offsets de
+#              keys uint64[n] ordenadas, offsets uint64[n+1], items uint64[total],
+#              scores float32[total]
+# La clave de cada sección es el uid (como entero) del usuario o producto; las listas
+# globales (top_rated, trending) usan la clave GLOBAL_KEY. La sección "catalog" guarda
+# en items el inicio y fin de cada producto dentro de un blob JSON utf-8 al final.
+
+MAGIC = b"RECSNAP\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+ENTRY_NAME_SIZE = 16
+ENTRY = struct.Struct(f"<{ENTRY_NAME_SIZE}sQQQQQQ")
+BLOB = struct.Struct("<QQ")
+GLOBAL_KEY = 0
+
+USER_SECTIONS = ("history", "similar")
+PRODUCT_SECTIONS = ("copurchase",)
+GLOBAL_SECTIONS = ("top_rated", "trending")
+
+if sys.byteorder != "little":
+    raise ImportError("snapshot.py asume una plataforma little endian")
+
+
+def _uid_int(uid):
+    return uid if isinstance(uid, int) else int(uid, 16)
+
+
+def _align(f):
+    pad = -f.tell() % 8
+    if pad:
+        f.write(b"\0" * pad)
+    return f.tell()
+
+
+# Escritura
+def write_snapshot(path, sections, catalog=None, version=None):
+    """
+    Escribe el snapshot con atomic_write: un lector que esté sirviendo sigue con el
+    archivo anterior hasta que el nuevo está completo.
+
+    sections: {nombre: {uid: [(item_uid, score), ...]}}
+    catalog: {product_uid: {"name": ..., "category": ..., "price": ...}}
+    """
+    sections = dict(sections)
+    for name in sections:
+        if len(name.encode("utf-8")) > ENTRY_NAME_SIZE:
+            raise ValueError(f"nombre de sección demasiado largo (máx. {ENTRY_NAME_SIZE} bytes utf-8): {name!r}")
+    if catalog:
+        blob = bytearray()
+        entries = {}
+        for uid, product in catalog.items():
+            start = len(blob)
+            blob += json.dumps(product, ensure_ascii=False).encode("utf-8")
+            entries[uid] = [(start, 0.0), (len(blob), 0.0)]
+        sections["catalog"] = entries
+    else:
+        blob = b""
+    version = version or time.time_ns()
+
+    with atomic_write(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), version))
+        directory_at = f.tell()
+        f.write(b"\0" * (ENTRY.size * len(sections) + BLOB.size))
+        entries = []
+        for name, lists in sections.items():
+            keys = sorted((_uid_int(k), v) for k, v in lists.items())
+            offsets = array.array("Q", [0])
+            items = array.array("Q")
+            scores = array.array("f")
+            for _, values in keys:
+                for item, score in values:
+                    items.append(_uid_int(item))
+                    scores.append(float(score or 0.0))
+                offsets.append(len(items))
+            positions = []
+            for data in (array.array("Q", (k for k, _ in keys)), offsets, items, scores):
+                positions.append(_align(f))
+                f.write(data.tobytes())
+            entries.append(ENTRY.pack(name.encode("utf-8"), len(keys), len(items), *positions))
+        blob_at = _align(f)
+        f.write(blob)
+        f.seek(directory_at)
+        f.write(b"".join(entries))
+        f.write(BLOB.pack(blob_at, len(blob)))
+    return version
+
+
+# Lectura
+class _Mapping:
+    """Un snapshot mapeado en memoria con vistas (sin copia) sobre cada array."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mm)
+        magic, fmt, n_sections, self.version = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} no es un snapshot de formato {FORMAT_VERSION}")
+        self.sections = {}
+        at = HEADER.size
+        for _ in range(n_sections):
+            name, n_keys, n_values, keys_at, offsets_at, items_at, scores_at = ENTRY.unpack_from(view, at)
+            at += ENTRY.size
+            self.sections[name.rstrip(b"\0").decode("utf-8")] = (
+                view[keys_at:keys_at + 8 * n_keys].cast("Q"),
+                view[offsets_at:offsets_at + 8 * (n_keys + 1)].cast("Q"),
+                view[items_at:items_at + 8 * n_values].cast("Q"),
+                view[scores_at:scores_at + 4 * n_values].cast("f"),
+            )
+        blob_at, blob_len = BLOB.unpack_from(view, at)
+        self.blob = view[blob_at:blob_at + blob_len]
+
+    def lookup(self, section, key):
+        arrays = self.sections.get(section)
+        if arrays is None:
+            raise KeyError(f"Sección desconocida: {section}")
+        keys, offsets, items, scores = arrays
+        i = bisect.bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return items[0:0], scores[0:0]
+        start, end = offsets[i], offsets[i + 1]
+        return items[start:end], scores[start:end]
+
+
+def _identity(st):
+    return st.st_dev, st.st_ino, st.st_mtime_ns
+
+
+class SnapshotReader:
+    """
+    Sirve recomendaciones desde un snapshot mapeado en memoria. Cada `check_interval`
+    segundos comprueba si el archivo fue reemplazado (otro inode) y cambia al nuevo
+    mapeo; las vistas ya entregadas siguen apuntando al snapshot anterior, que se libera
+    cuando nadie las usa.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mapping = _Mapping(path)
+        self._checked_at = time.monotonic()
+
+    @property
+    def version(self):
+        return self._mapping.version
+
+    def reload_if_changed(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if _identity(st) == _identity(self._mapping.stat):
+            return False
+        with self._lock:
+            if _identity(st) != _identity(self._mapping.stat):
+                self._mapping = _Mapping(self.path)
+        return True
+
+    def _current(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self.reload_if_changed()
+        return self._mapping
+
+    def lookup(self, section, uid=GLOBAL_KEY):
+        """(items, scores) como memoryviews sin copia: uids enteros y scores float32."""
+        return self._current().lookup(section, _uid_int(uid))
+
+    def recommendations(self, section, uid=GLOBAL_KEY):
+        """Lista de (product_uid hex, score) para usos fuera del camino crítico."""
+        items, scores = self.lookup(section, uid)
+        return [(hex(item), score) for item, score in zip(items, scores)]
+
+    def product(self, uid):
+        mapping = self._current()
+        items, _ = mapping.lookup("catalog", _uid_int(uid))
+        if not len(items):
+            return None
+        return json.loads(bytes(mapping.blob[items[0]:items[1]]))
+
+
+# Job de construcción
+def _all_nodes(client, root, body):
+    for raw in iter_node_pages(client, root, body):
+        yield from loads(raw).get("rows", [])
+
+
+def _ids(items, score_field=None):
+    return [(item["uid"], item[score_field] if score_field else 0.0) for item in items]
+
+
+def build_snapshot(client, path, k=10, workers=8):
+    """Ejecuta los recomendadores de model.py para todos los usuarios/productos y escribe el snapshot."""
+    users = list(_all_nodes(client, "has(email)", "email"))
+    products = list(_all_nodes(client, "has(category)", "name category price"))
+
+    def for_user(user):
+        email = user["email"]
+        return user["uid"], (
+            _ids(get_history_recommendations(client, email, limit=k)["items"]),
+            _ids(get_similar_users(client, email, limit=k)["items"], "score"),
+        )
+
+    def for_product(product):
+        return product["uid"], _ids(get_copurchased_products(client, product["name"], limit=k)["items"], "count")
+
+    sections = {name: {} for name in USER_SECTIONS + PRODUCT_SECTIONS + GLOBAL_SECTIONS}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for uid, (history, similar) in pool.map(for_user, users):
+            sections["history"][uid] = history
+            sections["similar"][uid] = similar
+        for uid, copurchase in pool.map(for_product, products):
+            sections["copurchase"][uid] = copurchase
+    sections["top_rated"][GLOBAL_KEY] = _ids(get_top_rated_products(client, limit=k)["items"], "avg_rating")
+    sections["trending"][GLOBAL_KEY] = _ids(get_trending_products(client, limit=k)["items"], "total")
+
+    catalog = {p["uid"]: {"name": p.get("name"), "category": p.get("category"), "price": p.get("price")}
+               for p in products}
+    return write_snapshot(path, sections, catalog)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el snapshot de recomendaciones")
+    parser.add_argument("--host", default="localhost:9080")
+    parser.add_argument("--output", default="recommendations.snap")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    client = pydgraph.DgraphClient(pydgraph.DgraphClientStub(args.host))
+    start = time.perf_counter()
+    version = build_snapshot(client, args.output, args.top_k, args.workers)
+    print(f"✔ Snapshot {version} escrito en {args.output} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
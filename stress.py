@@ -0,0 +1,328 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pydgraph
+
+from decode import loads
+from model import (
+    get_copurchased_products,
+    get_history_recommendations,
+    get_most_purchased_products,
+    get_most_viewed_products,
+    get_reviews,
+    get_similar_users,
+    get_top_rated_products,
+    get_trending_products,
+    get_user_dashboard,
+    get_user_interactions,
+    search_reviews,
+)
+from pagination import iter_node_pages
+from rollup import update_buckets
+from transactions import MAX_RETRIES, commit_with_retries
+
+# Stress de lecturas y escrituras concurrentes contra un Dgraph local: escritores de
+# interacciones/carritos/reseñas (como populate.py) y lectores de cada query de
+# model.py, con una tasa de operaciones que sube por escalones. Por escalón reporta
+# throughput, latencias p50/p95/p99 por operación y tasas de abort/reintento, y marca
+# el escalón donde aparece la saturación. Los resultados se guardan en JSON.
+
+SEARCH_WORDS = ["masterpiece", "colors", "wall", "beautiful", "print", "gift", "frame"]
+
+
+class Workload:
+    """Datos existentes (usuarios y productos) sobre los que leer y escribir."""
+
+    def __init__(self, client, seed=42):
+        self.client = client
+        # rng: datos de cada operación (compartido entre hilos, siempre con lock);
+        # schedule_rng: secuencia de operaciones, solo desde el hilo que programa la carga,
+        # así la mezcla es la misma en cada ejecución con la misma semilla
+        self.rng = random.Random(seed)
+        self.schedule_rng = random.Random(seed + 1)
+        self.lock = threading.Lock()
+        self.users = [u for raw in iter_node_pages(client, "has(email)", "email")
+                      for u in loads(raw).get("rows", [])]
+        self.products = [p for raw in iter_node_pages(client, "has(category)", "name")
+                         for p in loads(raw).get("rows", [])]
+        if not self.users or not self.products:
+            raise RuntimeError("No hay usuarios o productos: ejecute primero la opción 2 del menú")
+
+    def user(self):
+        with self.lock:
+            return self.rng.choice(self.users)
+
+    def product(self):
+        with self.lock:
+            return self.rng.choice(self.products)
+
+    def products_sample(self, n):
+        with self.lock:
+            return self.rng.sample(self.products, min(n, len(self.products)))
+
+    def choice(self, seq):
+        with self.lock:
+            return self.rng.choice(seq)
+
+    def randint(self, a, b):
+        with self.lock:
+            return self.rng.randint(a, b)
+
+    def uniform(self, a, b):
+        with self.lock:
+            return self.rng.uniform(a, b)
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+# Escritores
+def write_interaction(w):
+    user, product = w.user(), w.product()
+    interaction = {
+        "uid": "_:interaction",
+        "interaction_type": w.choice(["view", "view", "view", "click", "purchase"]),
+        "timestamp": _now(),
+        "duration": round(w.uniform(0.5, 30.0), 1),
+        "by_user": {"uid": user["uid"]},
+        "with_product": {"uid": product["uid"]},
+    }
+
+    # El evento y sus buckets van en la misma transacción, como en populate.py
+    _, aborts = update_buckets(w.client, [(product["uid"], interaction["interaction_type"],
+                                           interaction["timestamp"], interaction["duration"])],
+                               set_obj=interaction)
+    return aborts
+
+
+def write_cart(w):
+    cart = {
+        "uid": "_:cart",
+        "cart_created_at": _now(),
+        "has_cart": {"uid": w.user()["uid"]},
+        "contains": [{"uid": p["uid"]} for p in w.products_sample(w.randint(1, 3))],
+    }
+    _, aborts = commit_with_retries(w.client, lambda txn: txn.mutate(set_obj=cart))
+    return aborts
+
+
+def write_review(w):
+    review = {
+        "uid": "_:review",
+        "rating": float(w.randint(1, 5)),
+        "comment": f"Stress review: {w.choice(SEARCH_WORDS)} {w.choice(SEARCH_WORDS)}",
+        "review_created_at": _now(),
+        "reviewed_by": {"uid": w.user()["uid"]},
+        "of_product": {"uid": w.product()["uid"]},
+    }
+    _, aborts = commit_with_retries(w.client, lambda txn: txn.mutate(set_obj=review))
+    return aborts
+
+
+WRITERS = {
+    "write_interaction": write_interaction,
+    "write_cart": write_cart,
+    "write_review": write_review,
+}
+
+# Lectores: una entrada por función de model.py
+READERS = {
+    "get_reviews": lambda w: get_reviews(w.client, w.product()["name"]),
+    "get_user_interactions": lambda w: get_user_interactions(w.client, w.user()["email"]),
+    "get_history_recommendations": lambda w: get_history_recommendations(w.client, w.user()["email"]),
+    "get_copurchased_products": lambda w: get_copurchased_products(w.client, w.product()["name"]),
+    "get_most_purchased_products": lambda w: get_most_purchased_products(w.client),
+    "get_most_viewed_products": lambda w: get_most_viewed_products(w.client),
+    "get_similar_users": lambda w: get_similar_users(w.client, w.user()["email"]),
+    "get_top_rated_products": lambda w: get_top_rated_products(w.client),
+    "get_trending_products": lambda w: get_trending_products(w.client),
+    "search_reviews": lambda w: search_reviews(w.client, w.choice(SEARCH_WORDS)),
+    "get_user_dashboard": lambda w: get_user_dashboard(w.client, w.user()["email"]),
+}
+
+
+# Medición
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(samples, target_rate, elapsed, dropped):
+    """samples: [(op, latencia_s, servicio_s, aborts, error)] de un escalón."""
+    per_op = {}
+    for op in sorted({s[0] for s in samples}):
+        rows = [s for s in samples if s[0] == op]
+        latencies = sorted(s[1] * 1000 for s in rows if not s[4])
+        service = sorted(s[2] * 1000 for s in rows if not s[4])
+        writes = op in WRITERS
+        per_op[op] = {
+            "count": len(rows),
+            "errors": sum(1 for s in rows if s[4]),
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "service_p99_ms": percentile(service, 0.99),
+            "aborts": sum(s[3] for s in rows) if writes else None,
+            "abort_rate": sum(s[3] for s in rows) / len(rows) if writes else None,
+        }
+    completed = sum(1 for s in samples if not s[4])
+    all_latencies = sorted(s[1] * 1000 for s in samples if not s[4])
+    return {
+        "target_rate": target_rate,
+        "throughput": completed / elapsed if elapsed else 0.0,
+        "completed": completed,
+        "errors": sum(1 for s in samples if s[4]),
+        "dropped": dropped,
+        "p50_ms": percentile(all_latencies, 0.50),
+        "p99_ms": percentile(all_latencies, 0.99),
+        "ops": per_op,
+    }
+
+
+def run_step(workload, pool, rate, duration, write_ratio, max_pending):
+    """
+    Carga en lazo abierto: las operaciones se programan a intervalos fijos y la latencia
+    se mide desde el instante programado, así la cola que se forma al saturar cuenta.
+    """
+    samples = []
+    pending = []
+    dropped = 0
+    interval = 1.0 / rate
+    readers, writers = list(READERS), list(WRITERS)
+
+    def execute(op, scheduled):
+        started = time.perf_counter()
+        aborts, error = 0, None
+        try:
+            if op in WRITERS:
+                aborts = WRITERS[op](workload) or 0
+            else:
+                READERS[op](workload)
+        except pydgraph.errors.AbortedError:
+            aborts, error = MAX_RETRIES, "aborted"
+        except Exception as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+        samples.append((op, finished - scheduled, finished - started, aborts, error))
+
+    start = time.perf_counter()
+    next_at = start
+    end = start + duration
+    while next_at < end:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending = [f for f in pending if not f.done()]
+        if len(pending) >= max_pending:
+            dropped += 1
+        else:
+            schedule = workload.schedule_rng
+            op = schedule.choice(writers) if schedule.random() < write_ratio else schedule.choice(readers)
+            pending.append(pool.submit(execute, op, next_at))
+        next_at += interval
+    for f in pending:
+        f.result()
+    return summarize(samples, rate, time.perf_counter() - start, dropped)
+
+
+def find_saturation(steps, throughput_ratio=0.9, p99_factor=5.0):
+    """Primer escalón donde el throughput no alcanza la tasa pedida o el p99 se dispara."""
+    baseline = next((s["p99_ms"] for s in steps if s["p99_ms"] is not None), None)
+    for step in steps:
+        if step["throughput"] < throughput_ratio * step["target_rate"]:
+            return step["target_rate"], "throughput"
+        if baseline and step["p99_ms"] and step["p99_ms"] > p99_factor * baseline:
+            return step["target_rate"], "p99"
+        if step["dropped"]:
+            return step["target_rate"], "cola llena"
+    return None, None
+
+
+def print_step(step):
+    print(f"\n▶ {step['target_rate']:.0f} ops/s objetivo → {step['throughput']:.1f} ops/s "
+          f"(p50 {step['p50_ms'] or 0:.1f} ms, p99 {step['p99_ms'] or 0:.1f} ms, "
+          f"errores {step['errors']}, descartadas {step['dropped']})")
+    print(f"  {'operación':<30}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'aborts/op':>11}{'err':>5}")
+    for op, r in step["ops"].items():
+        abort_rate = f"{r['abort_rate']:.3f}" if r["abort_rate"] is not None else "-"
+        print(f"  {op:<30}{r['count']:>6}{r['p50_ms'] or 0:>9.1f}{r['p95_ms'] or 0:>9.1f}"
+              f"{r['p99_ms'] or 0:>9.1f}{abort_rate:>11}{r['errors']:>5}")
+
+
+def compare(previous_path, current):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    before = {s["target_rate"]: s for s in previous["steps"]}
+    print(f"\nComparación con {previous_path}:")
+    print(f"  {'ops/s':>8}{'throughput antes':>18}{'después':>10}{'p99 antes':>12}{'después':>10}")
+    for step in current["steps"]:
+        old = before.get(step["target_rate"])
+        if old:
+            print(f"  {step['target_rate']:>8.0f}{old['throughput']:>18.1f}{step['throughput']:>10.1f}"
+                  f"{old['p99_ms'] or 0:>12.1f}{step['p99_ms'] or 0:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress de lecturas/escrituras concurrentes sobre Dgraph")
+    parser.add_argument("--host", default="localhost:9080")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--start-rate", type=float, default=10.0, help="ops/s del primer escalón")
+    parser.add_argument("--max-rate", type=float, default=640.0, help="ops/s del último escalón")
+    parser.add_argument("--ramp", type=float, default=2.0, help="multiplicador de tasa entre escalones")
+    parser.add_argument("--step-seconds", type=float, default=20.0)
+    parser.add_argument("--write-ratio", type=float, default=0.3, help="fracción de operaciones de escritura")
+    parser.add_argument("--max-pending", type=int, default=1000, help="operaciones en cola antes de descartar")
+    parser.add_argument("--seed", type=int, default=42, help="semilla de la mezcla y los datos de cada operación")
+    parser.add_argument("--stop-at-saturation", action="store_true")
+    parser.add_argument("--output-dir", default="stress_results")
+    parser.add_argument("--compare", help="resultado JSON anterior para comparar")
+    args = parser.parse_args()
+
+    client = pydgraph.DgraphClient(pydgraph.DgraphClientStub(args.host))
+    workload = Workload(client, args.seed)
+    print(f"Stress sobre {args.host}: {len(workload.users)} usuarios, {len(workload.products)} productos, "
+          f"{args.threads} hilos, {args.write_ratio:.0%} escrituras")
+
+    started_at = _now()
+    steps = []
+    rate = args.start_rate
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        while rate <= args.max_rate:
+            step = run_step(workload, pool, rate, args.step_seconds, args.write_ratio, args.max_pending)
+            steps.append(step)
+            print_step(step)
+            if args.stop_at_saturation and find_saturation(steps)[0] is not None:
+                break
+            rate *= args.ramp
+
+    saturation, reason = find_saturation(steps)
+    if saturation is None:
+        print("\nSin saturación en el rango probado.")
+    else:
+        print(f"\nSaturación a partir de {saturation:.0f} ops/s ({reason}).")
+
+    result = {
+        "started_at": started_at,
+        "config": vars(args),
+        "saturation": {"rate": saturation, "reason": reason},
+        "steps": steps,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"stress-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Resultados guardados en {path}")
+    if args.compare:
+        compare(args.compare, result)
+
+
+if __name__ == "__main__":
+    main()
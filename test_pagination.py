@@ -0,0 +1,82 @@
+import base64
+import json
+
+import pytest
+
+from model import _keyset_clause
+from pagination import decode_cursor, encode_cursor, keyset_page
+
+
+def fetch(rows, limit, key, state):
+    """Simula la query: orden desc, le(valor del cursor), offset = empates y first = limit + 1."""
+    def value_of(row):
+        return [row[k] for k in key] if isinstance(key, tuple) else row[key]
+
+    ordered = sorted(rows, key=value_of, reverse=True)
+    if state:
+        ordered = [row for row in ordered if value_of(row) <= state["value"]]
+        ordered = ordered[state["ties"]:]
+    return ordered[:limit + 1]
+
+
+def walk(rows, limit, key):
+    seen, states, cursor = [], [], None
+    while True:
+        state = decode_cursor(cursor)
+        page = keyset_page(fetch(rows, limit, key, state), limit, key, state)
+        seen.extend(row["id"] for row in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return seen, states
+        states.append(decode_cursor(cursor))
+
+
+def test_ties_spanning_pages_are_not_repeated_or_skipped():
+    rows = [{"id": i, "score": s} for i, s in enumerate([5, 5, 5, 5, 5, 4, 4, 3, 3, 3, 3])]
+    seen, _ = walk(rows, 2, "score")
+    assert sorted(seen) == [row["id"] for row in rows]
+    assert len(seen) == len(set(seen))
+
+
+def test_ties_accumulate_across_consecutive_pages():
+    rows = [{"id": i, "score": 5} for i in range(7)] + [{"id": 7, "score": 1}]
+    _, states = walk(rows, 2, "score")
+    assert states == [{"value": 5, "ties": 2}, {"value": 5, "ties": 4}, {"value": 5, "ties": 6}]
+
+
+def test_compound_key_only_counts_full_ties():
+    rows = [{"id": i, "rating": r, "date": d}
+            for i, (r, d) in enumerate([(5, "b"), (5, "b"), (5, "a"), (4, "c"), (4, "c"), (4, "c")])]
+    seen, states = walk(rows, 2, ("rating", "date"))
+    assert sorted(seen) == list(range(len(rows)))
+    assert states[0] == {"value": [5, "b"], "ties": 2}
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 json!",
+    raw_cursor([1, 2]),
+    raw_cursor("value"),
+    encode_cursor({"value": 5, "ties": -1}),
+    encode_cursor({"value": 5, "ties": "2"}),
+    encode_cursor({"value": 5, "ties": 1.5}),
+    encode_cursor({"value": 5, "ties": True}),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("value", ["5", None, True, [5], float("nan")])
+def test_non_numeric_keyset_values_are_rejected(value):
+    with pytest.raises(ValueError):
+        _keyset_clause({"value": value, "ties": 0}, "score")
+
+
+def test_valid_cursor_round_trips():
+    state = {"value": 4.5, "ties": 3}
+    assert decode_cursor(encode_cursor(state)) == state
+    assert _keyset_clause(state, "score") == (" AND le(val(score), 4.5)", 3)
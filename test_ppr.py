@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+import ppr
+
+U1, U2, U3, U4 = 0x1, 0x2, 0x3, 0x4
+P10, P11, P12, P13 = 0xA, 0xB, 0xC, 0xD
+
+BEFORE = [(U1, P10), (U2, P10), (U2, P11), (U3, P12), (U4, P13)]
+# u3 -> p11 está a 3 saltos de u1 (u1 - p10 - u2 - p11)
+AFTER = BEFORE + [(U3, P11)]
+
+
+def use_edges(monkeypatch, edges):
+    users, products = zip(*edges)
+    monkeypatch.setattr(ppr, "export_edges", lambda client: (
+        np.array(users, dtype=np.uint64), np.array(products, dtype=np.uint64), np.ones(len(edges))))
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_incremental_matches_full_three_hops_away(monkeypatch, tmp_path):
+    state, output, full_output = tmp_path / "state.npz", tmp_path / "out.json", tmp_path / "full.json"
+    use_edges(monkeypatch, BEFORE)
+    ppr.run_full(None, output=str(output), state=str(state))
+
+    use_edges(monkeypatch, AFTER)
+    results, _ = ppr.run_incremental(None, str(state), output=str(output))
+    ppr.run_full(None, output=str(full_output))
+
+    assert set(results) == {hex(U1), hex(U2), hex(U3)}
+    incremental, full = read(output), read(full_output)
+    assert incremental.keys() == full.keys()
+    for user, recs in full.items():
+        assert [p for p, _ in incremental[user]] == [p for p, _ in recs]
+        assert [s for _, s in incremental[user]] == pytest.approx([s for _, s in recs])
+
+
+def test_affected_users_stops_at_disconnected_components():
+    graph = ppr.BipartiteGraph(*(np.array(c, dtype=np.uint64) for c in zip(*AFTER)), np.ones(len(AFTER)))
+    users, products = (np.array(c, dtype=np.uint64) for c in zip(*BEFORE))
+    affected = ppr.affected_users((users, products, np.ones(len(BEFORE))), graph)
+    assert sorted(affected) == [hex(U1), hex(U2), hex(U3)]
+
+
+def test_affected_users_detects_weight_changes():
+    users, products = (np.array(c, dtype=np.uint64) for c in zip(*BEFORE))
+    weights = np.ones(len(BEFORE))
+    heavier = weights.copy()
+    heavier[-1] = 5.0
+    graph = ppr.BipartiteGraph(users, products, heavier)
+    assert ppr.affected_users((users, products, weights), graph) == [hex(U4)]
+
+
+def test_affected_users_bounds_change_of_skipped_users():
+    rng = np.random.default_rng(42)
+    users = rng.integers(0, 3000, 12_000).astype(np.uint64) + 0x1000
+    popularity = 1.0 / np.arange(1, 1001)
+    products = rng.choice(1000, 12_000, p=popularity / popularity.sum()).astype(np.uint64) + 0x10000
+    weights = np.ones(len(users))
+    before = ppr.BipartiteGraph(users, products, weights)
+    # Arista nueva hacia el producto más popular: el peor caso para el alcance
+    after = ppr.BipartiteGraph(np.append(users, users[0]), np.append(products, 0x10000), np.append(weights, 1.0))
+
+    tol = 0.05
+    affected = ppr.affected_users((users, products, weights), after, tol=tol)
+    skipped = np.setdiff1d(after.user_ids, [int(u, 16) for u in affected])
+    assert hex(int(users[0])) in affected
+    assert len(skipped) > after.n_users // 2
+
+    rows = np.searchsorted(after.user_ids, rng.choice(skipped, 256, replace=False))
+    old = ppr.personalized_pagerank(before, rows, iterations=100, tol=0)
+    new = ppr.personalized_pagerank(after, rows, iterations=100, tol=0)
+    assert np.abs(new - old).sum(axis=1).max() <= tol
@@ -0,0 +1,24 @@
+import pydgraph
+
+# Escrituras con reintentos: Dgraph aborta una transacción si otra modificó los mismos
+# nodos o predicados indexados desde que empezó; se repite entera en una nueva.
+
+MAX_RETRIES = 5
+
+
+def commit_with_retries(client, mutate, retries=MAX_RETRIES):
+    """
+    Ejecuta mutate(txn) y hace commit en una transacción nueva, repitiendo todo si
+    aborta por conflicto. Devuelve (resultado de mutate, nº de aborts).
+    """
+    for attempt in range(retries):
+        txn = client.txn()
+        try:
+            result = mutate(txn)
+            txn.commit()
+            return result, attempt
+        except pydgraph.errors.AbortedError:
+            if attempt == retries - 1:
+                raise
+        finally:
+            txn.discard()